@@ -1,7 +1,7 @@
 import logging
 from telegram.ext import Application, CommandHandler
 from .config import settings
-from .handlers import menu, count_salary, send_invoice, sign_rc, count_ifta # Import new handler
+from .handlers import menu, count_salary, send_invoice, batch_invoice, sign_rc, count_ifta # Import new handler
 
 logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
 logging.getLogger("httpx").setLevel(logging.WARNING)
@@ -12,10 +12,12 @@ def build_app() -> Application:
     
     app.add_handler(count_salary.handler())
     app.add_handler(send_invoice.handler())
+    app.add_handler(batch_invoice.handler())
     app.add_handler(sign_rc.handler())
     app.add_handler(count_ifta.handler()) # Add new handler
     
     app.add_handler(CommandHandler("start", menu.start))
+    app.add_handler(CommandHandler("latency", menu.latency_report))
     
     return app
 
@@ -33,6 +33,27 @@ class Settings(BaseSettings):
     geckodriver_path: str = Field(..., alias="GECKODRIVER_PATH")
     firefox_profile_path: str = Field(..., alias="FIREFOX_PROFILE_PATH")
     states_geojson_path: str = Field(..., alias="STATES_GEOJSON_PATH")
+    sheet_mirror_ttl: int = Field(120, alias="SHEET_MIRROR_TTL")
+    sheet_mirror_full_ttl: int = Field(1800, alias="SHEET_MIRROR_FULL_TTL")
+    sheets_reads_per_minute: int = Field(60, alias="SHEETS_READS_PER_MINUTE")
+    sheets_writes_per_minute: int = Field(60, alias="SHEETS_WRITES_PER_MINUTE")
+    drive_blob_cache_mb: int = Field(256, alias="DRIVE_BLOB_CACHE_MB")
+    drive_download_chunk_mb: int = Field(100, alias="DRIVE_DOWNLOAD_CHUNK_MB")
+    drive_folder_shared: bool = Field(False, alias="DRIVE_FOLDER_SHARED")
+    pdf_backend: str = Field("pymupdf", alias="PDF_BACKEND")
+    pod_dpi: int = Field(150, alias="POD_DPI")
+    pod_grayscale: bool = Field(False, alias="POD_GRAYSCALE")
+    pod_max_mb: int = Field(4, alias="POD_MAX_MB")
+    rc_preview_dpi: int = Field(110, alias="RC_PREVIEW_DPI")
+    rc_preview_pages: int = Field(4, alias="RC_PREVIEW_PAGES")
+    route_cache_days: int = Field(180, alias="ROUTE_CACHE_DAYS")
+    browser_idle_seconds: int = Field(600, alias="BROWSER_IDLE_SECONDS")
+    browser_pool_size: int = Field(2, alias="BROWSER_POOL_SIZE")
+    browser_max_uses: int = Field(200, alias="BROWSER_MAX_USES")
+    browser_max_rss_mb: int = Field(1500, alias="BROWSER_MAX_RSS_MB")
+    browser_block_heavy: bool = Field(True, alias="BROWSER_BLOCK_HEAVY")
+    worker_processes: int = Field(0, alias="WORKER_PROCESSES")
+    batch_invoice_threads: int = Field(8, alias="BATCH_INVOICE_THREADS")
 
     @property
     def owner_operators(self) -> List[str]:
@@ -0,0 +1,126 @@
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import (
+    CommandHandler, ConversationHandler, MessageHandler, CallbackQueryHandler,
+    ContextTypes, filters
+)
+import re
+from ..config import settings
+from ..services import aio, batch_invoice
+
+# States
+STATE_CHOOSE_SOURCE, STATE_ENTER_LIST, STATE_CONFIRM = range(3)
+PREVIEW_LINES = 30
+MESSAGE_LIMIT = 4000
+MAX_LOADS = 100  # per batch
+MAX_RANGE = 50  # rows in one a-b range
+
+def _parse_pairs(text: str) -> tuple[list[tuple[str, int]], list[str]]:
+    """'Yura:12 13 Walter:40-42, Nestor 7' -> ([('Yura', 12), ('Yura', 13), ('Walter', 40), ...], tokens not used)
+
+    Only configured drivers are accepted; a row or range applies to the driver named before it.
+    """
+    known = {d.lower(): d for d in settings.owner_operators + settings.company_drivers}
+    names = "|".join(re.escape(name) for name in sorted(known, key=len, reverse=True))
+    pairs, ignored, driver = [], [], None
+    for token in re.findall((rf"\b(?:{names})\b|" if names else "") + r"\d+\s*-\s*\d+|[^\s,;:]+", text, re.IGNORECASE):
+        if token.lower() in known: driver = known[token.lower()]; continue
+        if not (rows := re.fullmatch(r"(\d+)(?:\s*-\s*(\d+))?", token)):
+            ignored.append(f"{token} (unknown driver)" if token[0].isalpha() else token); driver = None; continue
+        first, last = int(rows[1]), int(rows[2] or rows[1])
+        if driver is None: ignored.append(f"{token} (no driver before it)")
+        elif first < batch_invoice.FIRST_ROW or last < first: ignored.append(f"{token} (not a load row)")
+        elif last - first >= MAX_RANGE: ignored.append(f"{token} (more than {MAX_RANGE} rows)")
+        else: pairs += [(driver, row) for row in range(first, last + 1)]
+    return pairs, ignored
+
+def _not_used(ignored: list[str]) -> str:
+    return "Not used: " + ", ".join(ignored[:PREVIEW_LINES]) + (f" … and {len(ignored) - PREVIEW_LINES} more" if len(ignored) > PREVIEW_LINES else "")
+
+async def _reply(update: Update, text: str, **kwargs):
+    if update.callback_query: await update.callback_query.edit_message_text(text, **kwargs)
+    else: await update.message.reply_text(text, **kwargs)
+
+async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    context.user_data.clear()
+    if update.callback_query: await update.callback_query.answer()
+    if context.args: return await _confirm(update, context, *_parse_pairs(" ".join(context.args)))
+    kb = [[InlineKeyboardButton("📦 All delivered, not invoiced", callback_data="batch:pending")],
+          [InlineKeyboardButton("✍️ Enter driver:row list", callback_data="batch:list")],
+          [InlineKeyboardButton("Cancel", callback_data="action:cancel")]]
+    await _reply(update, "Batch invoice: which loads?", reply_markup=InlineKeyboardMarkup(kb))
+    return STATE_CHOOSE_SOURCE
+
+async def restart(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    context.user_data.clear()
+    await update.message.reply_text("Operation cancelled. Send /start to see the main menu.")
+    return ConversationHandler.END
+
+async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    context.user_data.clear()
+    q = update.callback_query; await q.answer()
+    await q.edit_message_text("Operation cancelled. Send /start to see the main menu.")
+    return ConversationHandler.END
+
+async def pick_source(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    q = update.callback_query; await q.answer()
+    if q.data == "batch:list":
+        await q.edit_message_text("Send the loads as driver:row pairs, e.g. `Yura:12 Walter:40-42`", parse_mode="Markdown")
+        return STATE_ENTER_LIST
+    await q.edit_message_text("⏳ Looking for delivered loads without an invoice...")
+    try: pairs = await aio.run("sheets", batch_invoice.pending)
+    except Exception as e:
+        await q.edit_message_text(f"❌ Could not read the sheets: {e}")
+        return ConversationHandler.END
+    return await _confirm(update, context, pairs)
+
+async def handle_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    pairs, ignored = _parse_pairs(update.message.text or "")
+    if not pairs:
+        note = "\n" + _not_used(ignored) if ignored else ""
+        await update.message.reply_text(f"No driver:row pairs found. Try again, e.g. Yura:12 Walter:40-42{note}")
+        return STATE_ENTER_LIST
+    return await _confirm(update, context, pairs, ignored)
+
+async def _confirm(update: Update, context: ContextTypes.DEFAULT_TYPE, pairs: list[tuple[str, int]], ignored: list[str] = ()):
+    pairs = list(dict.fromkeys(pairs)); notes = [_not_used(ignored)] if ignored else []
+    if len(pairs) > MAX_LOADS:
+        notes.append(f"Only the first {MAX_LOADS} of {len(pairs)} loads are queued; run again for the rest."); pairs = pairs[:MAX_LOADS]
+    if not pairs:
+        await _reply(update, "\n".join(["Nothing to invoice."] + notes))
+        return ConversationHandler.END
+    context.user_data["pairs"] = pairs
+    lines = [f"{driver} row {row}" for driver, row in pairs[:PREVIEW_LINES]]
+    if len(pairs) > PREVIEW_LINES: lines.append(f"… and {len(pairs) - PREVIEW_LINES} more")
+    lines += notes
+    kb = [[InlineKeyboardButton("📄 Generate", callback_data="run:upload"), InlineKeyboardButton("📧 Generate + email", callback_data="run:email")],
+          [InlineKeyboardButton("Cancel", callback_data="action:cancel")]]
+    await _reply(update, f"{len(pairs)} load(s) to invoice:\n" + "\n".join(lines), reply_markup=InlineKeyboardMarkup(kb))
+    return STATE_CONFIRM
+
+async def run_batch(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    q = update.callback_query; await q.answer()
+    pairs = context.user_data.get("pairs", []); email = q.data == "run:email"
+    await q.edit_message_text(f"⏳ Invoicing {len(pairs)} load(s)" + (" and emailing brokers..." if email else "..."))
+    try: results = await aio.run("batch", batch_invoice.run, pairs, email=email)
+    except Exception as e:
+        await q.message.reply_text(f"❌ Batch invoice failed: {e}")
+        return ConversationHandler.END
+    # Telegram caps a message at 4096 characters, so a long report goes out in several.
+    chunk = ""
+    for line in batch_invoice.report(results).split("\n"):
+        if len(chunk) + len(line) + 1 > MESSAGE_LIMIT: await q.message.reply_text(chunk); chunk = ""
+        chunk += line + "\n"
+    if chunk.strip(): await q.message.reply_text(chunk)
+    context.user_data.clear()
+    return ConversationHandler.END
+
+def handler() -> ConversationHandler:
+    return ConversationHandler(
+        entry_points=[CommandHandler("batch_invoice", start), CallbackQueryHandler(start, pattern="^act:batch_invoice$")],
+        states={
+            STATE_CHOOSE_SOURCE: [CallbackQueryHandler(pick_source, pattern=r"^batch:.+")],
+            STATE_ENTER_LIST: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_list)],
+            STATE_CONFIRM: [CallbackQueryHandler(run_batch, pattern=r"^run:.+")],
+        },
+        fallbacks=[CommandHandler("start", restart), CallbackQueryHandler(cancel, pattern="^action:cancel$")],
+    )
@@ -4,7 +4,7 @@ from telegram.ext import (
     ContextTypes, filters
 )
 from ..config import settings
-from ..services import ifta_service
+from ..services import aio, ifta_service
 import os
 
 # States
@@ -68,7 +68,7 @@ async def handle_fuel_pdf(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     pdf_path = f"./files_cash/ifta_fuel_{update.effective_user.id}.pdf"
     await file.download_to_drive(pdf_path)
 
-    result_text = ifta_service.parse_fuel_statement(pdf_path)
+    result_text = await aio.run("cpu", ifta_service.parse_fuel_statement, pdf_path)
     await update.message.reply_text(result_text, parse_mode="Markdown")
     os.remove(pdf_path)
     return ConversationHandler.END
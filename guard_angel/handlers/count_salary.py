@@ -1,5 +1,4 @@
 from __future__ import annotations
-import os
 import re
 from datetime import datetime
 from typing import Dict, Any
@@ -8,19 +7,13 @@ from telegram.ext import (
     CallbackQueryHandler, CommandHandler, ConversationHandler,
     ContextTypes, MessageHandler, filters
 )
-from PyPDF2 import PdfReader, PdfMerger
 from ..config import settings
-from ..services import sheets
+from ..services import aio, pdf_backend, pdf_tools
 
 STATE_CHOOSE_DRIVER, STATE_ENTER_CELL, STATE_INSURANCE_DATE, STATE_WAIT_STATEMENT_PDF = range(4)
 COMPANY_DRIVERS = settings.company_drivers
 OWNER_OPERATORS = settings.owner_operators
 
-def _cleanup_files(context: ContextTypes.DEFAULT_TYPE):
-    for fp in context.user_data.get("temp_files", []):
-        try: os.remove(fp)
-        except OSError: pass
-
 async def start_conversation(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     context.user_data.clear()
     drivers = settings.owner_operators + settings.company_drivers
@@ -32,12 +25,12 @@ async def start_conversation(update: Update, context: ContextTypes.DEFAULT_TYPE)
     return STATE_CHOOSE_DRIVER
 
 async def restart(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    _cleanup_files(context); context.user_data.clear()
+    context.user_data.clear()
     await update.message.reply_text("Operation cancelled. Send /start to see the main menu.")
     return ConversationHandler.END
 
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    _cleanup_files(context); context.user_data.clear()
+    context.user_data.clear()
     q = update.callback_query; await q.answer()
     await q.edit_message_text("Operation cancelled. Send /start to see the main menu.")
     return ConversationHandler.END
@@ -67,7 +60,7 @@ async def handle_insurance_date(update: Update, context: ContextTypes.DEFAULT_TY
         return STATE_INSURANCE_DATE
     driver = context.user_data["driver"]; cell = context.user_data["cell"]
     try:
-        prev_insurance_date = datetime.strptime(sheets.open_prev_insurance(driver, cell)[0].split('-')[1], "%m/%d/%Y")
+        prev_insurance_date = datetime.strptime((await aio.sheets.open_prev_insurance(driver, cell))[0].split('-')[1], "%m/%d/%Y")
         diff_days = (insurance_end_date - prev_insurance_date).days
         if diff_days < 0:
             await update.message.reply_text("End date cannot be before the previous period's end date.")
@@ -82,81 +75,67 @@ async def handle_insurance_date(update: Update, context: ContextTypes.DEFAULT_TY
         await update.message.reply_text(f"Error calculating insurance: {e}.\nCancelling.")
         return ConversationHandler.END
 
-def extract_from_fuel_pdf(pdf_path: str) -> Dict[str, Any]:
+def extract_from_fuel_pdf(pdf: bytes) -> Dict[str, Any]:
     results = {"totals": 0.0, "discount": 0.0, "start_date": None, "end_date": None}
     try:
-        with open(pdf_path, "rb") as f:
-            reader = PdfReader(f)
-            page_text = reader.pages[0].extract_text() or ""
-            for line in page_text.splitlines():
-                if match := re.match(r"Totals (\d[\d,\.]*)", line): results["totals"] = float(match.group(1).replace(",", ""))
-                elif match := re.match(r"Total Discount (\d[\d,\.]*)", line): results["discount"] = float(match.group(1).replace(",", ""))
-                elif re.match(r"Transaction Date\d{4}-\d{2}-\d{2}", line):
-                    dates = re.findall(r"\d{4}-\d{2}-\d{2}", line)
-                    if len(dates) >= 2: results["start_date"], results["end_date"] = dates[-1], dates[0]
+        page_text = pdf_backend.page_texts(pdf, pages=1)[0]
+        for line in page_text.splitlines():
+            if match := re.match(r"Totals (\d[\d,\.]*)", line): results["totals"] = float(match.group(1).replace(",", ""))
+            elif match := re.match(r"Total Discount (\d[\d,\.]*)", line): results["discount"] = float(match.group(1).replace(",", ""))
+            elif re.match(r"Transaction Date\s*\d{4}-\d{2}-\d{2}", line):
+                dates = re.findall(r"\d{4}-\d{2}-\d{2}", line)
+                if len(dates) >= 2: results["start_date"], results["end_date"] = dates[-1], dates[0]
     except Exception as e: print(f"Error extracting from fuel PDF: {e}")
     return results
 
 async def handle_fuel_statement(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     pdf_file = await update.message.document.get_file()
-    fuel_pdf_path = f"./files_cash/fuel_statement_{update.effective_user.id}.pdf"
-    context.user_data.setdefault("temp_files", []).append(fuel_pdf_path)
-    os.makedirs(os.path.dirname(fuel_pdf_path), exist_ok=True)
-    await pdf_file.download_to_drive(fuel_pdf_path)
+    fuel_pdf = bytes(await pdf_file.download_as_bytearray())
     await update.message.reply_text("Fuel statement received, processing...")
-    fuel_data = extract_from_fuel_pdf(fuel_pdf_path)
+    fuel_data = await aio.run("cpu", extract_from_fuel_pdf, fuel_pdf)
     context.user_data.update(fuel_data)
-    return await process_owner_operator_salary(update, context, fuel_pdf_path)
+    return await process_owner_operator_salary(update, context, fuel_pdf)
 
 async def process_company_driver_salary(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     driver = context.user_data["driver"]; cell = context.user_data["cell"]
     try:
         final_pdf_name = f"Statement_{driver}_{datetime.now().strftime('%m-%d-%Y')}.pdf"
-        context.user_data.setdefault("temp_files", []).extend(["./files_cash/1st_page.pdf", final_pdf_name])
-        sheets.compilate_salary_company_driver(driver, cell, "", "")
-        os.rename("./files_cash/1st_page.pdf", final_pdf_name)
+        statement = await aio.sheets.compilate_salary_company_driver(driver, cell, "", "")
         await update.message.reply_text("Uploading to Google Drive...")
-        # **FIX**: Added column='X' for statements
-        sheets.upload_file(final_pdf_name, driver, cell, column='X')
-        sheets.update_cell(driver, cell, 'Y', 'no insurance')
-        with open(final_pdf_name, 'rb') as doc: await update.message.reply_document(document=doc)
+        async with aio.sheet_batch(driver) as batch:
+            await aio.sheets.upload_file((final_pdf_name, statement), driver, cell, column='X', batch=batch)
+            batch.set(cell, 'Y', 'no insurance')
+        await update.message.reply_document(document=statement, filename=final_pdf_name)
         await update.message.reply_text("✅ Statement created!")
     except Exception as e: await update.message.reply_text(f"❌ An error occurred: {e}")
-    finally: _cleanup_files(context); return ConversationHandler.END
+    return ConversationHandler.END
 
-async def process_owner_operator_salary(update: Update, context: ContextTypes.DEFAULT_TYPE, fuel_pdf_path: str) -> int:
+async def process_owner_operator_salary(update: Update, context: ContextTypes.DEFAULT_TYPE, fuel_pdf: bytes) -> int:
     ud = context.user_data
     driver, cell = ud["driver"], ud["cell"]
     try:
         await update.message.reply_text("Generating final statement PDF...")
-        sheets.compilate_salary_page(
+        first_page = await aio.sheets.compilate_salary_page(
             driver=driver, cell=cell, 
             fuel_start_date=ud.get("start_date"), fuel_end_date=ud.get("end_date"),
             totals=ud.get("totals", 0), discount=ud.get("discount", 0),
             insurance=ud.get("insurance_payment", 0), insurance_d=ud.get("insurance_period_str", ""),
             trailer=ud.get("trailer_payment", 0), trailer_d="Trailer Payment"
         )
-        first_page_path = "./files_cash/1st_page.pdf"
         final_pdf_name = f"Statement_{driver}_{datetime.now().strftime('%m-%d-%Y')}.pdf"
-        ud.setdefault("temp_files", []).extend([first_page_path, final_pdf_name])
-        merger = PdfMerger()
-        merger.append(first_page_path)
-        merger.append(fuel_pdf_path)
-        merger.write(final_pdf_name)
-        merger.close()
-        
+        # One in-memory buffer feeds both the Drive upload and the Telegram reply.
+        statement = await aio.run("cpu", pdf_tools.merge_pdf_bytes, [first_page, fuel_pdf])
+
         await update.message.reply_text("Uploading to Google Drive...")
-        # **FIX**: Added column='X' for statements
-        sheets.upload_file(final_pdf_name, driver, cell, column='X')
-        sheets.update_cell(driver, cell, 'Y', ud["insurance_period_str"])
+        async with aio.sheet_batch(driver) as batch:
+            await aio.sheets.upload_file((final_pdf_name, statement), driver, cell, column='X', batch=batch)
+            batch.set(cell, 'Y', ud["insurance_period_str"])
         
-        with open(final_pdf_name, 'rb') as doc: await update.message.reply_document(document=doc)
+        await update.message.reply_document(document=statement, filename=final_pdf_name)
         await update.message.reply_text("✅ Owner-Operator Statement created!")
     except Exception as e:
         await update.message.reply_text(f"❌ An error occurred during final processing: {e}")
-    finally:
-        _cleanup_files(context)
-        return ConversationHandler.END
+    return ConversationHandler.END
 
 def handler() -> ConversationHandler:
     return ConversationHandler(
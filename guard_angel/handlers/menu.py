@@ -1,6 +1,7 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from ..config import settings
+from ..services import latency
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.effective_user.id not in settings.authorized_users:
@@ -10,6 +11,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     kb = [
         [InlineKeyboardButton("💵 Count salary",   callback_data="act:count_salary")],
         [InlineKeyboardButton("📄 Send invoice",   callback_data="act:send_invoice")],
+        [InlineKeyboardButton("🧾 Batch invoices", callback_data="act:batch_invoice")],
         [InlineKeyboardButton("🖊️ Sign RC",        callback_data="act:sign_RC")],
         [InlineKeyboardButton("⛽ Count IFTA",     callback_data="act:count_ifta")],
     ]
@@ -20,3 +22,8 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.callback_query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(kb))
     else:
         await update.message.reply_text(text, reply_markup=InlineKeyboardMarkup(kb))
+
+async def latency_report(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/latency: where mileage lookups spend their time (per-phase histograms since startup)."""
+    if update.effective_user.id not in settings.authorized_users: return
+    await update.message.reply_text(f"```\n{latency.report()}\n```", parse_mode="Markdown")
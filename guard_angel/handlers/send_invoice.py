@@ -3,13 +3,12 @@ from telegram.ext import (
     CommandHandler, ConversationHandler, MessageHandler, CallbackQueryHandler, 
     ContextTypes, filters
 )
+import asyncio
 import os
-import shutil
-import img2pdf
 import io
 from ..config import settings
-from ..services import sheets, email as email_service
-from PyPDF2 import PdfMerger
+from ..services import aio, sheets, pdf_backend, pdf_tools, pod_ingest, blob_cache, email as email_service
+from ..services.load_row import INVOICE_AMOUNTS
 
 # States
 STATE_CHOOSE_DRIVER, STATE_ENTER_ROW, STATE_WAIT_POD_UPLOAD, STATE_CONFIRM_EXISTING_POD, STATE_CONFIRM_EMAIL = range(5)
@@ -48,9 +47,12 @@ async def handle_row_entry(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try: row = int(update.message.text)
     except (ValueError, TypeError): return STATE_ENTER_ROW
     context.user_data["row"] = row; driver = context.user_data["driver"]
-    load_data = sheets.open_invoice_load(driver, row)[0]
-    pod_link = load_data[13] if len(load_data) > 13 and load_data[13] else None
-    context.user_data["load_num"] = load_data[7]
+    load = await aio.sheets.open_load(driver, row)
+    if not load:
+        await update.message.reply_text(f"Row {row} is empty. Please enter another row number:")
+        return STATE_ENTER_ROW
+    pod_link = load.pod_link or None
+    context.user_data["load_num"] = load.load_number
     context.user_data["pod_files"] = []
     
     kb = [[InlineKeyboardButton("✅ Done Uploading", callback_data="pod:done")]]
@@ -82,6 +84,16 @@ async def handle_pod_files(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(f"File #{len(context.user_data['pod_files'])} received. Send more or click 'Done'.")
     return STATE_WAIT_POD_UPLOAD
 
+def _merge_pod_files(pod_files: list, out_path: str) -> list[Exception]:
+    # Photos are rotated, downsampled and re-encoded in the worker processes first.
+    parts, errors = pod_ingest.normalize_all([file_stream.getvalue() for file_stream in pod_files])
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    pdf_backend.merge(parts, out_path)
+    return errors
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f: return f.read()
+
 async def merge_and_upload_pod(update: Update, context: ContextTypes.DEFAULT_TYPE):
     q = update.callback_query; await q.answer()
     pod_files = context.user_data.get("pod_files", [])
@@ -90,50 +102,39 @@ async def merge_and_upload_pod(update: Update, context: ContextTypes.DEFAULT_TYP
         return STATE_WAIT_POD_UPLOAD
 
     await q.edit_message_text(f"Merging {len(pod_files)} file(s) into one POD...")
-    
-    merger = PdfMerger()
-    os.makedirs("./files_cash", exist_ok=True)
-    
-    for file_stream in pod_files:
-        file_stream.seek(0)
-        if file_stream.read(4) == b'%PDF':
-            file_stream.seek(0)
-            merger.append(file_stream)
-        else:
-            file_stream.seek(0)
-            try:
-                pdf_bytes = img2pdf.convert(file_stream.read())
-                merger.append(io.BytesIO(pdf_bytes))
-            except Exception as e:
-                await update.effective_message.reply_text(f"Could not convert an image to PDF: {e}")
 
     load_num = context.user_data["load_num"]
     merged_pod_path = f"./files_cash/POD_{load_num}_MERGED.pdf"
-    merger.write(merged_pod_path)
-    merger.close()
+    for e in await aio.run("cpu", _merge_pod_files, pod_files, merged_pod_path):
+        await update.effective_message.reply_text(f"Could not convert a file to PDF: {e}")
 
-    await update.effective_message.reply_text("✅ POD merged. Uploading...")
-    sheets.upload_pod(merged_pod_path, context.user_data["driver"], context.user_data["row"])
-    await update.effective_message.reply_text("✅ POD uploaded.\n\n⏳ Generating final invoice...")
-    
+    # The merged POD is uploaded together with the invoice (one permissions batch, one sheet write).
+    context.user_data["pod_path"] = merged_pod_path
+    await update.effective_message.reply_text("✅ POD merged.\n\n⏳ Generating final invoice...")
     return await generate_invoice(update, context)
 
 async def generate_invoice(update: Update, context: ContextTypes.DEFAULT_TYPE):
     driver = context.user_data["driver"]; row = context.user_data["row"]
+    # A POD merged in this conversation is already on disk and is not downloaded back.
+    pod_path = context.user_data.get("pod_path"); uploaded = False
     try:
-        load_data = sheets.open_invoice_load(driver, row)[0]
-        load_num=load_data[7]; broker=load_data[6]; pu_date=load_data[0]; del_date=load_data[2]; pu_city=load_data[4]; del_city=load_data[5]; gross=load_data[9]; lumper_k=load_data[14]; lumper_b=load_data[15]; inv_num=load_data[18]; rc_link=load_data[8]; pod_link=load_data[13]; broker_email=load_data[19]
-        cc_emails = load_data[16].split() if len(load_data) > 16 and load_data[16] else []
-        sheets.compilate_invoice_page(load_num, driver, row, broker, pu_city, pu_date, del_city, del_date, inv_num, gross, lumper_k, lumper_b)
-        rc_id = sheets.get_id_from_link(rc_link); pod_id = sheets.get_id_from_link(pod_link)
-        sheets.download_file(rc_id, "RC.pdf"); sheets.download_file(pod_id, "POD.pdf")
-        merger = PdfMerger()
+        load = await aio.sheets.open_load(driver, row)
+        if load is None: raise ValueError(f"{driver} row {row} is empty")
+        load.check_amounts(driver, INVOICE_AMOUNTS)
+        load_num = load.load_number; rc_link = load.rc_link; pod_link = load.pod_link; broker_email = load.accounting_email
+        cc_emails = load.cc_emails
+        # Render the invoice page and fetch RC + POD at the same time, then merge in memory.
+        fetch_pod = aio.run("cpu", _read_file, pod_path) if pod_path else aio.run("drive", blob_cache.view, sheets.get_id_from_link(pod_link))
+        page, rc, pod = await asyncio.gather(
+            aio.sheets.compilate_invoice_page(load_num, driver, row, load.broker, load.pu_location, load.pu_date_text, load.del_location, load.del_date_text, load.invoice_no, load.gross, load.lumper_kolobok, load.lumper_broker),
+            aio.run("drive", blob_cache.view, sheets.get_id_from_link(rc_link)),
+            fetch_pod,
+        )
         final_filename = f"Invoice_{load_num}_MC_1294648.pdf"
-        merger.append(f"./files_cash/Invoice_{load_num}_MC_1294648.pdf"); merger.append("./files_cash/RC.pdf"); merger.append("./files_cash/POD.pdf")
-        merger.write(final_filename); merger.close()
-        
-        # **THE FIX IS HERE**: Added column='R'
-        sheets.upload_file(final_filename, driver, row, column='R')
+        await aio.run("cpu", pdf_tools.merge_pdf_bytes, [page, rc, pod], final_filename)
+
+        await aio.sheets.upload_files(driver, [(final_filename, row, 'R')] + ([(pod_path, row, 'N')] if pod_path else []))
+        uploaded = True
         
         context.user_data.update({"final_invoice_path": final_filename, "broker_email": broker_email, "cc_list": cc_emails, "load_num": load_num})
         kb = [[InlineKeyboardButton("✅ Yes, Send Email", callback_data="email:yes"), InlineKeyboardButton("❌ No", callback_data="email:no")]]
@@ -143,8 +144,19 @@ async def generate_invoice(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except Exception as e:
         reply_method = update.message.reply_text if hasattr(update, 'message') and update.message else update.callback_query.message.reply_text
         await reply_method(f"❌ Error during generation: {e}")
+        # Keep the freshly merged POD even when the invoice could not be built.
+        if pod_path and not uploaded:
+            try: await aio.sheets.upload_pod(pod_path, driver, row)
+            except Exception as e: await reply_method(f"❌ POD upload failed too: {e}")
+        _cleanup(context.user_data)
         return ConversationHandler.END
 
+def _cleanup(ud: dict):
+    # Only this conversation's files: other invoices may be in flight in ./files_cash at the same time.
+    for key in ("final_invoice_path", "pod_path"):
+        try: os.remove(ud.pop(key))
+        except (KeyError, OSError): pass
+
 async def handle_email_decision(update: Update, context: ContextTypes.DEFAULT_TYPE):
     q = update.callback_query; await q.answer()
     decision = q.data.split(":", 1)[1]
@@ -152,12 +164,11 @@ async def handle_email_decision(update: Update, context: ContextTypes.DEFAULT_TY
     if decision == "yes":
         await q.edit_message_caption(caption="🚀 Sending email...")
         try:
-            email_service.send_invoice_email(recipient_email=ud["broker_email"], cc_list=ud["cc_list"], subject=f'POD/Invoice Order {ud["load_num"]} Carrier KOLOBOK, INC. MC 1294648', load_num=ud["load_num"], attachment_path=ud["final_invoice_path"])
+            await aio.run("email", email_service.send_invoice_email, recipient_email=ud["broker_email"], cc_list=ud["cc_list"], subject=f'POD/Invoice Order {ud["load_num"]} Carrier KOLOBOK, INC. MC 1294648', load_num=ud["load_num"], attachment_path=ud["final_invoice_path"])
             await q.edit_message_caption(caption="✅ Email sent successfully!")
         except Exception as e: await q.edit_message_caption(caption=f"❌ Failed to send email: {e}")
     else: await q.edit_message_caption(caption="✅ Invoice generated. Operation complete.")
-    if os.path.exists(ud.get("final_invoice_path", "")): os.remove(ud["final_invoice_path"])
-    shutil.rmtree("./files_cash", ignore_errors=True)
+    _cleanup(ud)
     return ConversationHandler.END
 
 def handler() -> ConversationHandler:
@@ -4,13 +4,13 @@ import asyncio
 import re
 import subprocess
 from datetime import datetime
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto
 from telegram.ext import (
     CommandHandler, ConversationHandler, MessageHandler, CallbackQueryHandler, 
     ContextTypes, filters
 )
 from ..config import settings
-from ..services import rate_confirmation as rc_service, sheets
+from ..services import aio, rate_confirmation as rc_service, broker_directory
 
 # States for the conversation
 STATE_CHOOSE_ACTION, CHOOSE_DRIVER_VIEW, CHOOSE_DRIVER_ADD, WAIT_RC_PDF, ASK_SIGN, WAIT_FOR_SIGNING, COLLECT_DATA, COLLECT_BROKER_EMAILS, AWAIT_BROKER_INFO, AWAIT_ACCOUNTING_EMAIL = range(10)
@@ -41,16 +41,13 @@ async def view_rc_for_driver(update: Update, context: ContextTypes.DEFAULT_TYPE)
     driver = q.data.split(":", 1)[1]
     await q.edit_message_text(f"Fetching current RC for {driver}...")
     try:
-        summary, rc_link, image_paths = rc_service.view_current_load(driver)
+        summary, rc_link, previews, page_count = await aio.rate_confirmation.view_current_load(driver)
         kb = [[InlineKeyboardButton("👉 Click to Open RC 📋👈", url=rc_link)]] if rc_link else None
         await q.message.reply_text(summary, parse_mode="Markdown", reply_markup=InlineKeyboardMarkup(kb) if kb else None)
-        # **FIX**: Send the images
-        if image_paths:
-            await q.message.reply_text("RC Pages:")
-            for path in image_paths:
-                with open(path, 'rb') as photo_file:
-                    await q.message.reply_photo(photo=photo_file)
-                os.remove(path)
+        # All pages go out as one album (Telegram wants 2-10 items in a media group).
+        caption = f"RC pages 1-{len(previews)} of {page_count}" if page_count > len(previews) else "RC pages"
+        if len(previews) == 1: await q.message.reply_photo(photo=previews[0], caption=caption)
+        elif previews: await q.message.reply_media_group([InputMediaPhoto(p, caption=caption if i == 0 else None) for i, p in enumerate(previews[:10])])
     except Exception as e: await q.message.reply_text(f"❌ Error: {e}")
     return ConversationHandler.END
 
@@ -123,7 +120,10 @@ async def finish_collection(update: Update, context: ContextTypes.DEFAULT_TYPE)
     await update.message.reply_text("All data collected. Writing to Google Sheet...")
     try:
         data = context.user_data['collected_data']; driver = context.user_data['driver']
-        acc_email_found = rc_service.write_load_to_sheet(driver, data, SIGNED_RC_PATH)
+        # The Maps lookup waits on the browser lane, so it never holds a Sheets slot.
+        total_miles = await aio.rate_confirmation.route_miles(driver, data)
+        row, acc_email_found = await aio.rate_confirmation.write_load_to_sheet(driver, data, SIGNED_RC_PATH, total_miles)
+        context.user_data['row'] = row
         if not acc_email_found:
             await update.message.reply_text(f"⚠️ **New Broker!**\nPlease provide the **accounting email**.", parse_mode="Markdown")
             return AWAIT_ACCOUNTING_EMAIL
@@ -138,8 +138,9 @@ async def handle_accounting_email(update: Update, context: ContextTypes.DEFAULT_
     if not re.match(r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$", acc_email):
         await update.message.reply_text("❌ Invalid email. Try again."); return AWAIT_ACCOUNTING_EMAIL
     driver = context.user_data['driver']
-    current_row = sheets.get_current_cell(driver, column="A")
-    sheets.update_cell(driver, current_row, 'T', acc_email)
+    current_row = context.user_data.get('row') or await aio.sheets.get_current_cell(driver, column="A")
+    await aio.sheets.update_cell(driver, current_row, 'T', acc_email)
+    await aio.run("sheets", broker_directory.record, context.user_data['collected_data'].get("Broker Name"), acc_email, driver, current_row)
     await update.message.reply_text(f"✅ Email saved.\n\nNow, paste broker's **full company info** to create a customer file.", parse_mode="Markdown")
     return AWAIT_BROKER_INFO
 async def handle_broker_info(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
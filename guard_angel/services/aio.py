@@ -0,0 +1,46 @@
+from __future__ import annotations
+import asyncio, functools
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from . import sheets as _sheets, invoice as _invoice, rate_confirmation as _rate_confirmation
+from ..config import settings
+
+# Async facade for the blocking services. Handlers await these instead of
+# calling googleapiclient / FPDF / Selenium directly on the event loop.
+# Work runs on one shared thread pool; each lane has its own concurrency
+# limit so a slow Drive upload or mileage lookup only queues work of its kind.
+# Google clients are per-thread (see auth.py), so Sheets and Drive calls can
+# run side by side. The browser lane is as wide as the browser pool.
+LIMITS = {"sheets": 4, "drive": 4, "cpu": 2, "browser": settings.browser_pool_size, "email": 2, "batch": 1}
+_EXECUTOR = ThreadPoolExecutor(max_workers=sum(LIMITS.values()), thread_name_prefix="ga-io")
+_semaphores: dict[str, asyncio.Semaphore] = {}
+
+async def run(lane: str, fn, *args, **kwargs):
+    """Run a blocking callable on the worker pool within `lane`'s concurrency limit."""
+    sem = _semaphores.get(lane) or _semaphores.setdefault(lane, asyncio.Semaphore(LIMITS[lane]))
+    async with sem:
+        return await asyncio.get_running_loop().run_in_executor(_EXECUTOR, functools.partial(fn, *args, **kwargs))
+
+class _AsyncModule:
+    """Wraps a service module so every function becomes awaitable (`await aio.sheets.open_invoice_load(...)`)."""
+    def __init__(self, module, lane: str, lanes: dict[str, str] | None = None):
+        self._module, self._lane, self._lanes = module, lane, lanes or {}
+
+    def __getattr__(self, name):
+        fn = getattr(self._module, name)
+        if not callable(fn): return fn
+        lane = self._lanes.get(name, self._lane)
+        @functools.wraps(fn)
+        async def call(*args, **kwargs): return await run(lane, fn, *args, **kwargs)
+        return call
+
+sheets = _AsyncModule(_sheets, "sheets", {"compilate_invoice_page": "cpu", "upload_file": "drive", "upload_files": "drive", "upload_pod": "drive", "download_file": "drive"})
+invoice = _AsyncModule(_invoice, "drive")
+rate_confirmation = _AsyncModule(_rate_confirmation, "sheets", {"view_current_load": "drive", "route_miles": "browser"})
+
+@asynccontextmanager
+async def sheet_batch(driver: str):
+    """Async counterpart of `sheets.SheetBatch`: the flush runs on the sheets lane."""
+    batch = _sheets.SheetBatch(driver)
+    yield batch
+    await run("sheets", batch.flush)
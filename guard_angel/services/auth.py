@@ -1,16 +1,64 @@
 #!/usr/bin/python3
 
 # auth.py This file reads credentials keys that we downloaded from Google dashboard
-# and creates1️ (spreadsheet_service) and (drive_service) that we will be using to access 
-# google sheets and google drive later 
+# and hands out the (spreadsheet_service) and (drive_service) clients that we use to
+# access google sheets and google drive.
+#
+# Nothing is read or built at import time: credentials are loaded on first use,
+# clients are built from the discovery documents bundled with googleapiclient
+# (no discovery HTTP call), and every thread gets its own clients on top of its
+# own keep-alive httplib2.Http, since httplib2 is not thread-safe. All threads
+# share one credentials object whose token refreshes are serialized here.
 
 from __future__ import print_function
-from googleapiclient.discovery import build 
+import threading
+import httplib2
+import google_auth_httplib2
+from googleapiclient.discovery import build
 from google.oauth2 import service_account
 SCOPES = [
 'https://www.googleapis.com/auth/spreadsheets',
 'https://www.googleapis.com/auth/drive'
 ]
-credentials = service_account.Credentials.from_service_account_file('credentials.json', scopes=SCOPES)
-spreadsheet_service = build('sheets', 'v4', credentials=credentials)
-drive_service = build('drive', 'v3', credentials=credentials)
+CREDENTIALS_FILE = 'credentials.json'
+HTTP_TIMEOUT = 120
+_APIS = {"sheets": ("sheets", "v4"), "drive": ("drive", "v3")}
+
+_lock = threading.Lock()
+_local = threading.local()
+_credentials = None
+
+class _SharedCredentials:
+    """The one credentials object behind every thread's AuthorizedHttp; refreshes go through one lock."""
+    def __init__(self, credentials): self._credentials = credentials
+    def before_request(self, request, method, url, headers):
+        with _lock:
+            if not self._credentials.valid: self._credentials.refresh(request)
+            self._credentials.apply(headers)
+    def refresh(self, request):
+        with _lock: self._credentials.refresh(request)
+    def __getattr__(self, name): return getattr(self._credentials, name)
+
+def get_credentials() -> _SharedCredentials:
+    global _credentials
+    with _lock:
+        if _credentials is None:
+            _credentials = _SharedCredentials(service_account.Credentials.from_service_account_file(CREDENTIALS_FILE, scopes=SCOPES))
+        return _credentials
+
+def get_service(api: str):
+    """The calling thread's client for `api` ("sheets" or "drive"), built on first use."""
+    services = getattr(_local, "services", None)
+    if services is None: services = _local.services = {}
+    if api not in services:
+        http = google_auth_httplib2.AuthorizedHttp(get_credentials(), http=httplib2.Http(timeout=HTTP_TIMEOUT))
+        name, version = _APIS[api]
+        services[api] = build(name, version, http=http, cache_discovery=False, static_discovery=True)
+    return services[api]
+
+class _ThreadLocalService:
+    def __init__(self, api): self._api = api
+    def __getattr__(self, name): return getattr(get_service(self._api), name)
+
+spreadsheet_service = _ThreadLocalService("sheets")
+drive_service = _ThreadLocalService("drive")
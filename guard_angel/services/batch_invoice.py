@@ -0,0 +1,115 @@
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from . import blob_cache, email as email_service, invoice_template, sheets, workers
+from .load_row import INVOICE_AMOUNTS, LoadRow
+from .pdf_tools import merge_pdf_bytes
+from .sheet_mirror import mirror
+from ..config import settings
+
+# Batch invoicing: many (driver, row) loads generated, merged, uploaded and
+# optionally emailed in one run. RC/POD downloads, uploads and emails run on a
+# thread pool; rendering + merging (pure CPU) runs on the worker processes so a week
+# of invoices is not serialized behind the GIL. Uploads are grouped per driver,
+# so each tab gets one permissions batch and one sheet write.
+FIRST_ROW = 2
+
+@dataclass(slots=True)
+class Result:
+    driver: str
+    row: int
+    load_number: str = ""
+    status: str = "pending"  # pending | ok | skipped | failed
+    detail: str = ""
+    link: str | None = None
+    emailed: bool = False
+
+    def line(self) -> str:
+        mark = {"ok": "✅", "skipped": "⏭️"}.get(self.status, "❌")
+        text = f"{mark} {self.driver} row {self.row}" + (f" ({self.load_number})" if self.load_number else "")
+        if self.status == "ok": text += " — emailed" if self.emailed else " — uploaded"
+        return text + (f": {self.detail}" if self.detail else "")
+
+def pending(drivers: list[str] | None = None) -> list[tuple[str, int]]:
+    """(driver, row) of every delivered load not invoiced yet: POD link (N) set, invoice link (R) empty."""
+    drivers = drivers or settings.owner_operators + settings.company_drivers
+    return [(driver, load.row) for driver in drivers for load in mirror.load_rows(driver, FIRST_ROW)
+            if load.pu_date_text and load.pod_link and not load.invoice_link]
+
+def file_name(load: LoadRow) -> str:
+    return f"Invoice_{load.load_number}_MC_1294648.pdf"
+
+def _build(driver: str, load: LoadRow, rc: bytes, pod: bytes) -> bytes:
+    """Invoice page + RC + POD as one PDF; runs in a worker process."""
+    return merge_pdf_bytes([invoice_template.render_load(load, driver), rc, pod])
+
+def _fetch(link: str) -> bytes:
+    # bytes, not a view: it is pickled into the worker process anyway.
+    return bytes(blob_cache.view(sheets.get_id_from_link(link)))
+
+def _email(load: LoadRow, data: bytes):
+    email_service.send_invoice_email(recipient_email=load.accounting_email, cc_list=load.cc_emails, subject=f'POD/Invoice Order {load.load_number} Carrier KOLOBOK, INC. MC 1294648',
+                                     load_num=load.load_number, attachment_path=file_name(load), attachment=data)
+
+def _check(load: LoadRow | None, result: Result) -> bool:
+    if load is None or not load.pu_date_text: result.status, result.detail = "skipped", "row is empty"
+    elif load.invoice_link: result.status, result.detail = "skipped", "already invoiced"
+    elif not load.rc_link: result.status, result.detail = "skipped", "no RC link (column I)"
+    elif not load.pod_link: result.status, result.detail = "skipped", "no POD link (column N)"
+    else:
+        try: load.check_amounts(result.driver, INVOICE_AMOUNTS); return True
+        except ValueError as e: result.status, result.detail = "failed", str(e)
+    return False
+
+def run(pairs: list[tuple[str, int]], email: bool = False) -> list[Result]:
+    """Invoice each (driver, row); one Result per distinct pair, in the order given. A failing load never stops the others."""
+    results = [Result(driver, row) for driver, row in dict.fromkeys(pairs)]
+    loads: dict[int, LoadRow] = {}
+    for i, result in enumerate(results):
+        try: load = mirror.load_row(result.driver, result.row)
+        except Exception as e: result.status, result.detail = "failed", f"sheet read: {e}"; continue
+        if load is not None: result.load_number = load.load_number
+        if _check(load, result): loads[i] = load
+
+    built: dict[int, bytes] = {}
+    with ThreadPoolExecutor(max_workers=settings.batch_invoice_threads, thread_name_prefix="ga-batch") as io:
+        # 1. RC + POD downloads, each pair handed to the process pool as soon as both are in.
+        fetches = {io.submit(lambda l: (_fetch(l.rc_link), _fetch(l.pod_link)), load): i for i, load in loads.items()}
+        renders = {}
+        for f in as_completed(fetches):
+            i = fetches[f]
+            try: rc, pod = f.result()
+            except Exception as e: results[i].status, results[i].detail = "failed", f"download: {e}"; continue
+            renders[workers.processes().submit(_build, results[i].driver, loads[i], rc, pod)] = i
+        for f in as_completed(renders):
+            i = renders[f]
+            try: built[i] = f.result()
+            except Exception as e: results[i].status, results[i].detail = "failed", f"render: {e}"
+
+        # 2. Uploads, one call per driver.
+        by_driver: dict[str, list[int]] = {}
+        for i in built: by_driver.setdefault(results[i].driver, []).append(i)
+        uploads = {io.submit(sheets.upload_files, driver, [((file_name(loads[i]), built[i]), results[i].row, 'R') for i in idx]): idx for driver, idx in by_driver.items()}
+        for f in as_completed(uploads):
+            try:
+                for i, link in zip(uploads[f], f.result()): results[i].status, results[i].link = "ok", link
+            except Exception as e:
+                for i in uploads[f]: results[i].status, results[i].detail = "failed", f"upload: {e}"
+
+        # 3. Emails, only for invoices that made it onto the sheet.
+        if email:
+            sends = {}
+            for i, result in enumerate(results):
+                if result.status != "ok": continue
+                if not loads[i].accounting_email: result.detail = "no accounting email (column T)"; continue
+                sends[io.submit(_email, loads[i], built[i])] = i
+            for f in as_completed(sends):
+                i = sends[f]
+                try: f.result(); results[i].emailed = True
+                except Exception as e: results[i].detail = f"email failed: {e}"
+    return results
+
+def report(results: list[Result]) -> str:
+    ok = sum(r.status == "ok" for r in results); emailed = sum(r.emailed for r in results)
+    head = f"Batch invoice: {ok}/{len(results)} invoiced" + (f", {emailed} emailed" if emailed else "")
+    return "\n".join([head, ""] + [r.line() for r in results])
@@ -0,0 +1,93 @@
+from __future__ import annotations
+from pathlib import Path
+import mmap, os, re, shutil, threading
+from collections import OrderedDict
+from googleapiclient.http import MediaIoBaseDownload
+from . import scheduler
+from .auth import drive_service as dr
+from ..config import settings
+
+# Persistent cache of Drive file contents in .cache/drive_blobs.
+# A blob is named "<fileId>-<version>", where the version is the file's
+# md5Checksum (or modifiedTime for Google-native files), so a cache hit costs
+# one metadata call and an edited file is simply a new key. Least recently
+# used blobs are evicted once the directory grows past DRIVE_BLOB_CACHE_MB.
+_DIR = Path(__file__).resolve().parents[2] / ".cache" / "drive_blobs"
+_LOCK = threading.Lock()
+_index: OrderedDict[str, int] | None = None  # blob name -> size, oldest first
+CHUNK_SIZE = settings.drive_download_chunk_mb * 1024 * 1024
+
+def _load() -> OrderedDict[str, int]:
+    global _index
+    if _index is None:
+        _DIR.mkdir(parents=True, exist_ok=True)
+        blobs = sorted((p.stat().st_mtime, p.name, p.stat().st_size) for p in _DIR.iterdir() if p.is_file() and not p.name.endswith(".part"))
+        _index = OrderedDict((name, size) for _, name, size in blobs)
+    return _index
+
+def _evict(keep: str):
+    index = _load(); total = sum(index.values())
+    limit = settings.drive_blob_cache_mb * 1024 * 1024
+    while total > limit and len(index) > 1:
+        name = next(iter(index))
+        if name == keep: index.move_to_end(name); continue
+        total -= index.pop(name)
+        try: (_DIR / name).unlink()
+        except OSError: pass
+
+def _version(file_id: str) -> str:
+    meta = scheduler.execute(dr.files().get(fileId=file_id, fields="md5Checksum,modifiedTime"), api="drive", retry_on=scheduler.RETRY_STATUSES | {404})
+    return meta.get("md5Checksum") or re.sub(r"[^0-9A-Za-z]", "", meta.get("modifiedTime", ""))
+
+def _stream(file_id: str, fh):
+    downloader = MediaIoBaseDownload(fh, dr.files().get_media(fileId=file_id), chunksize=CHUNK_SIZE)
+    done = False
+    while not done: status, done = downloader.next_chunk()
+
+def _download(file_id: str, dest: Path):
+    # Chunks go straight into the blob file; no intermediate buffer.
+    part = dest.with_name(dest.name + ".part")
+    with open(part, "wb") as f: _stream(file_id, f)
+    os.replace(part, dest)
+
+def stream_into(file_id: str, fh):
+    """Download a Drive file straight into a caller-supplied writable file/buffer, bypassing the cache."""
+    scheduler.call(lambda: (fh.seek(0), fh.truncate(), _stream(file_id, fh)), api="drive", retry_on=scheduler.RETRY_STATUSES | {404})
+
+def open_blob(file_id: str):
+    """Open binary file of the current version of a Drive file, downloading it only on a miss.
+
+    The blob is opened under the cache lock, so evicting it afterwards (unlink) can't pull
+    it out from under the caller. Its name ("<fileId>-<version>") is `Path(f.name).name`.
+    """
+    if not file_id: raise ValueError("File ID missing")
+    name = f"{file_id}-{_version(file_id)}"; blob = _DIR / name
+    with _LOCK:
+        index = _load()
+        if name in index and blob.exists():
+            index.move_to_end(name); os.utime(blob)
+            return open(blob, "rb")
+    # A file uploaded moments ago can briefly 404, so 404 is retried here as well.
+    scheduler.call(lambda: _download(file_id, blob), api="drive", retry_on=scheduler.RETRY_STATUSES | {404}, key=("blob", name))
+    with _LOCK:
+        f = open(blob, "rb")
+        _load()[name] = os.fstat(f.fileno()).st_size; _load().move_to_end(name)
+        _evict(keep=name)
+    return f
+
+def open_mmap(file_id: str) -> mmap.mmap | bytes:
+    """Read-only mmap of the cached file; stays valid even if the blob is evicted meanwhile. An empty file is b"" (it can't be mapped)."""
+    with open_blob(file_id) as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+
+def view(file_id: str) -> memoryview:
+    """Zero-copy view of the cached file, backed by an mmap of the blob."""
+    return memoryview(open_mmap(file_id))
+
+def copy_to(file_id: str, dest: str):
+    """Materialize a Drive file at `dest` as a copy, so writes to it never reach the cached blob."""
+    os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+    # Unlink first: `dest` may still be a hard link into the cache left by an older version.
+    try: os.remove(dest)
+    except FileNotFoundError: pass
+    with open_blob(file_id) as src, open(dest, "wb") as out: shutil.copyfileobj(src, out)
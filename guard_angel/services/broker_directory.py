@@ -0,0 +1,68 @@
+from __future__ import annotations
+from pathlib import Path
+from contextlib import contextmanager
+from itertools import zip_longest
+import re, sqlite3, threading, time
+from . import scheduler
+from .auth import spreadsheet_service as sh
+from ..config import settings
+
+# Broker -> accounting email directory, kept in .cache/broker_directory.sqlite.
+# Built once from columns G/T of the EMAIL_LOOKUP_DRIVERS tabs, then kept up to
+# date by record() whenever we write an accounting email (column T).
+_PATH = Path(__file__).resolve().parents[2] / ".cache" / "broker_directory.sqlite"
+_LOCK = threading.Lock()
+
+def normalize(broker: str | None) -> str:
+    return re.sub(r"\s+", " ", (broker or "").strip().lower())
+
+@contextmanager
+def _db():
+    with _LOCK:
+        _PATH.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(_PATH)
+        try:
+            with conn:
+                conn.execute("CREATE TABLE IF NOT EXISTS brokers (name TEXT PRIMARY KEY, email TEXT NOT NULL, driver TEXT, row INTEGER, updated_at REAL NOT NULL)")
+                conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+                yield conn
+        finally: conn.close()
+
+def _built_for(conn: sqlite3.Connection) -> str | None:
+    found = conn.execute("SELECT value FROM meta WHERE key = 'built_for'").fetchone()
+    return found[0] if found else None
+
+def rebuild() -> int:
+    """Re-read G/T of every lookup tab and replace the directory; returns the number of brokers."""
+    drivers = settings.email_lookup_drivers
+    ranges = [f"{driver}!G2:G" for driver in drivers] + [f"{driver}!T2:T" for driver in drivers]
+    data = scheduler.execute(sh.spreadsheets().values().batchGet(spreadsheetId=settings.spreadsheet_id, ranges=ranges))['valueRanges'] if drivers else []
+    entries = {}
+    # Same precedence as the old backward scan: earlier tabs in EMAIL_LOOKUP_DRIVERS
+    # win over later ones, and within a tab the bottom-most (highest-numbered) row wins.
+    for i in reversed(range(len(drivers))):
+        brokers = data[i].get('values', []); emails = data[i + len(drivers)].get('values', [])
+        for j, (b, e) in enumerate(zip_longest(brokers, emails, fillvalue=[])):
+            if b and b[0] and e and e[0]: entries[normalize(b[0])] = (e[0], drivers[i], j + 2)
+    with _db() as conn:
+        conn.execute("DELETE FROM brokers")
+        conn.executemany("INSERT INTO brokers VALUES (?, ?, ?, ?, 0)", [(name, *entry) for name, entry in entries.items()])
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('built_for', ?)", (",".join(drivers),))
+    return len(entries)
+
+def lookup(broker: str | None) -> str | None:
+    name = normalize(broker)
+    if not name: return None
+    with _db() as conn:
+        built = _built_for(conn) == ",".join(settings.email_lookup_drivers)
+    if not built: rebuild()
+    with _db() as conn:
+        found = conn.execute("SELECT email FROM brokers WHERE name = ?", (name,)).fetchone()
+    return found[0] if found else None
+
+def record(broker: str | None, email: str | None, driver: str | None = None, row: int | None = None) -> None:
+    """Remember `email` as the latest accounting email for `broker`."""
+    name = normalize(broker)
+    if not name or not email: return
+    with _db() as conn:
+        conn.execute("INSERT OR REPLACE INTO brokers VALUES (?, ?, ?, ?, ?)", (name, email, driver, row, time.time()))
@@ -0,0 +1,171 @@
+from __future__ import annotations
+from contextlib import contextmanager
+import atexit, os, re, threading, time
+from . import latency
+from .route_cache import normalize
+from ..config import settings
+
+# Pool of headless Firefox workers for the Google Maps scrapers.
+# Up to BROWSER_POOL_SIZE browsers, each used by one caller at a time; callers
+# beyond that queue until a worker is free. A worker is started on first
+# demand, keeps one tab per scraper (so its pre-filled directions page
+# survives between lookups), is health-checked before every use, is recycled
+# after BROWSER_MAX_USES lookups or once its process tree grows past
+# BROWSER_MAX_RSS_MB, and is quit after BROWSER_IDLE_SECONDS without use.
+# Selenium itself is only imported when a browser starts. Images, web fonts and
+# WebGL (the vector map) are blocked through Firefox prefs: the scrapers only
+# read the directions panel, so the map itself is never needed.
+BLOCK_HEAVY_PREFS = {"permissions.default.image": 2, "gfx.downloadable_fonts.enabled": False, "browser.display.use_document_fonts": 0,
+                     "webgl.disabled": True, "media.autoplay.default": 5, "browser.cache.disk.enable": False}
+TRIP_ID = "section-directions-trip-0"
+
+class _Worker:
+    __slots__ = ("driver", "tabs", "shown", "current", "uses", "last_used")
+    def __init__(self, driver):
+        self.driver, self.tabs, self.uses, self.last_used = driver, {}, 0, time.monotonic()
+        self.shown: dict[str, tuple[tuple, str]] = {}  # tab name -> (waypoints its panel shows, their result text)
+        self.current = ""
+
+    def tab(self, name: str, url: str):
+        driver = self.driver; self.current = name
+        if name in self.tabs: driver.switch_to.window(self.tabs[name]); return driver
+        if self.tabs: driver.switch_to.new_window("tab")
+        driver.get(url); self.tabs[name] = driver.current_window_handle
+        return driver
+
+    def healthy(self) -> bool:
+        try: self.driver.current_window_handle; return True
+        except Exception: return False
+
+    def rss_mb(self) -> float:
+        """Resident memory of geckodriver + the Firefox processes under it (Linux; 0 elsewhere)."""
+        try: root = self.driver.service.process.pid
+        except AttributeError: return 0.0
+        children: dict[int, list[int]] = {}
+        for name in os.listdir("/proc") if os.path.isdir("/proc") else []:
+            try:
+                with open(f"/proc/{name}/stat") as f: children.setdefault(int(f.read().rsplit(")", 1)[1].split()[1]), []).append(int(name))
+            except (OSError, IndexError, ValueError): continue
+        total, todo = 0, [root]
+        while todo:
+            pid = todo.pop(); todo.extend(children.get(pid, []))
+            try:
+                with open(f"/proc/{pid}/status") as f: total += next((int(line.split()[1]) for line in f if line.startswith("VmRSS:")), 0)
+            except OSError: pass
+        return total / 1024
+
+    def quit(self):
+        try: self.driver.quit()
+        except Exception as e: print(f"Error closing browser: {e}")
+
+class BrowserPool:
+    def __init__(self, size: int, idle: float, max_uses: int, max_rss_mb: int):
+        self.size, self.idle, self.max_uses, self.max_rss_mb = size, idle, max_uses, max_rss_mb
+        self._slots = threading.BoundedSemaphore(size)  # waiters here are the request queue
+        self._lock = threading.Lock()
+        self._idle: list[_Worker] = []  # most recently used last
+        self._reaper: threading.Timer | None = None
+
+    @staticmethod
+    def _start() -> _Worker:
+        from selenium import webdriver
+        from selenium.webdriver.firefox.options import Options
+        from selenium.webdriver.firefox.service import Service
+        options = Options(); options.add_argument("-headless")
+        options.profile = settings.firefox_profile_path
+        for pref, value in (BLOCK_HEAVY_PREFS.items() if settings.browser_block_heavy else ()): options.set_preference(pref, value)
+        with latency.phase("browser.start"): worker = _Worker(webdriver.Firefox(service=Service(settings.geckodriver_path), options=options))
+        print("🌐 Browser started.")
+        return worker
+
+    def _acquire(self) -> _Worker:
+        with self._lock: worker = self._idle.pop() if self._idle else None
+        if worker is not None and not worker.healthy():
+            print("🌐 Browser failed its health check, replacing it."); worker.quit(); worker = None
+        return worker or self._start()
+
+    def _release(self, worker: _Worker, broken: bool):
+        worker.uses += 1; worker.last_used = time.monotonic()
+        if broken or worker.uses >= self.max_uses or (self.max_rss_mb and worker.rss_mb() > self.max_rss_mb):
+            print(f"🌐 Recycling browser after {worker.uses} lookup(s)."); worker.quit(); return
+        with self._lock:
+            self._idle.append(worker)
+            if self._reaper is None: self._schedule(self.idle)
+
+    @contextmanager
+    def session(self, name: str, url: str):
+        """Exclusive use of a pooled browser (the worker; its `driver` is switched to `name`'s tab, opened at `url` the first time)."""
+        from selenium.common.exceptions import WebDriverException
+        waited = time.perf_counter()
+        with self._slots:
+            worker = self._acquire(); broken = False
+            latency.record("browser.acquire", time.perf_counter() - waited)
+            try:
+                try: worker.tab(name, url)
+                except WebDriverException:
+                    # Died between the health check and now (crash, OOM kill); start a fresh one.
+                    worker.quit(); worker = self._start(); worker.tab(name, url)
+                yield worker
+            except WebDriverException: broken = True; raise
+            finally: self._release(worker, broken)
+
+    def _schedule(self, delay: float):
+        self._reaper = threading.Timer(delay, self._reap); self._reaper.daemon = True; self._reaper.start()
+
+    def _reap(self):
+        now = time.monotonic()
+        with self._lock:
+            self._reaper = None
+            expired = [w for w in self._idle if now - w.last_used >= self.idle]
+            self._idle = [w for w in self._idle if w not in expired]
+            if self._idle: self._schedule(min(self.idle - (now - w.last_used) for w in self._idle))
+        if expired: print(f"🌐 {len(expired)} browser(s) idle, shutting down.")
+        for worker in expired: worker.quit()
+
+    def close(self):
+        with self._lock: workers, self._idle = self._idle, []
+        for worker in workers: worker.quit()
+
+def trip_text(driver) -> str:
+    """Text of the first directions result on the page ("" if there is none yet)."""
+    from selenium.webdriver.common.by import By
+    found = driver.find_elements(By.ID, TRIP_ID)
+    try: return found[0].text if found else ""
+    except Exception: return ""  # replaced while we read it
+
+def entered(worker: _Worker, waypoints, fields=()) -> str | None:
+    """Panel text if the worker's current tab is already showing the route `waypoints`, else None.
+
+    Maps leaves the panel unchanged when the route on screen is entered again, so that
+    case is answered from here instead of being re-entered and waited on. The route on
+    screen is the one recorded by the last successful `wait_for_trip` (kept through failed
+    lookups, which leave the panel as it was), or else what the direction `fields` hold.
+    """
+    text = trip_text(worker.driver)
+    found = worker.shown.get(worker.current)
+    if found and found[1] != text: del worker.shown[worker.current]; found = None
+    if found: return text if found[0] == tuple(waypoints) else None
+    try: values = [field.get_attribute("value") or "" for field in fields]
+    except Exception: return None
+    if text and len(values) >= len(waypoints) and [normalize(v) for v in values[:len(waypoints)]] == [normalize(w) for w in waypoints]:
+        worker.shown[worker.current] = (tuple(waypoints), text); return text
+    return None
+
+def wait_for_trip(worker: _Worker, previous: str, pattern: str, timeout: float, waypoints) -> str:
+    """Text of the first directions result once it differs from `previous` and matches `pattern`.
+
+    Waits on the panel itself instead of fixed sleeps. Raises TimeoutException if it never
+    changes: an address Maps can't route leaves the previous lookup's result on screen.
+    Call `entered` first, so a route that is already on screen is not waited on.
+    """
+    from selenium.webdriver.support.wait import WebDriverWait
+    def ready(d):
+        text = trip_text(d)
+        return text if text != previous and re.search(pattern, text, re.IGNORECASE) else False
+    text = WebDriverWait(worker.driver, timeout, poll_frequency=0.1).until(ready)
+    worker.shown[worker.current] = (tuple(waypoints), text)
+    return text
+
+browser_pool = BrowserPool(size=settings.browser_pool_size, idle=settings.browser_idle_seconds,
+                           max_uses=settings.browser_max_uses, max_rss_mb=settings.browser_max_rss_mb)
+atexit.register(browser_pool.close)
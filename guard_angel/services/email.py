@@ -12,8 +12,8 @@ def get_greeting() -> str:
     current_hour = datetime.now().hour
     return "Good morning" if current_hour < 12 else "Good afternoon"
 
-def send_invoice_email(recipient_email: str, cc_list: list[str], subject: str, load_num: str, attachment_path: str):
-    """Sends an email with the invoice attached."""
+def send_invoice_email(recipient_email: str, cc_list: list[str], subject: str, load_num: str, attachment_path: str, attachment: bytes | None = None):
+    """Sends an email with the invoice attached (read from `attachment_path`, or `attachment` bytes named after it)."""
     
     msg = MIMEMultipart()
     msg["From"] = settings.smtp_user
@@ -32,12 +32,13 @@ def send_invoice_email(recipient_email: str, cc_list: list[str], subject: str, l
     )
     msg.attach(MIMEText(body, "plain"))
 
-    with open(attachment_path, 'rb') as attachment:
-        part = MIMEBase('application', 'octet-stream')
-        part.set_payload(attachment.read())
-        encoders.encode_base64(part)
-        part.add_header('Content-Disposition', f"attachment; filename={os.path.basename(attachment_path)}")
-        msg.attach(part)
+    if attachment is None:
+        with open(attachment_path, 'rb') as f: attachment = f.read()
+    part = MIMEBase('application', 'octet-stream')
+    part.set_payload(attachment)
+    encoders.encode_base64(part)
+    part.add_header('Content-Disposition', f"attachment; filename={os.path.basename(attachment_path)}")
+    msg.attach(part)
 
     all_recipients = [recipient_email] + cc_list
     
@@ -1,40 +1,39 @@
 import os
 import re
+import asyncio
 import pandas as pd
 import requests
 import geopandas as gpd
 from collections import defaultdict
 from math import radians, sin, cos, atan2, sqrt
 from shapely.geometry import LineString, MultiLineString
-from PyPDF2 import PdfReader
 from geopy.geocoders import Nominatim
 from telegram import Update
 from telegram.ext import ContextTypes
 
-from . import sheets
+from . import sheets, aio, pdf_backend, route_cache
 from ..config import settings
 from .mileage_calculator import mileage_browser
 
 # Add this helper function
-def create_progress_bar(current: int, total: int, length: int = 20) -> str:
+def create_progress_bar(current: int, total: int, length: int = 20, label: str = "Processing routes...") -> str:
     """Creates a text-based progress bar string."""
     percent = current / total
     filled_length = int(length * percent)
     bar = '█' * filled_length + '─' * (length - filled_length)
-    return f"Processing routes... {current}/{total}\n`[{bar}] {percent:.0%}`"
+    return f"{label} {current}/{total}\n`[{bar}] {percent:.0%}`"
 
 # --- FUEL PARSING LOGIC (This part is correct) ---
 def parse_fuel_statement(pdf_path: str) -> str:
     try:
-        pdf_reader = PdfReader(pdf_path)
-        full_text = "".join(page.extract_text() + "\n" for page in pdf_reader.pages)
+        full_text = pdf_backend.text(pdf_path)
         lines = full_text.split('\n')
         transactions = []
         current_state = "XX"
         parsing_active = True
         VALID_STATES = ["AL", "AZ", "AR", "CA", "CO", "CT", "DE", "FL", "GA", "ID", "IL", "IN", "IA", "KS", "KY", "LA", "ME", "MD", "MA", "MI", "MN", "MS", "MO", "MT", "NE", "NV", "NH", "NJ", "NM", "NY", "NC", "ND", "OH", "OK", "OR", "PA", "RI", "SC", "SD", "TN", "TX", "UT", "VT", "VA", "WA", "WV", "WI", "WY"]
         state_pattern = re.compile(r'.*?([A-Z]{2})\s*[\d\s.]*?(?:ULSD|ULSR|FUEL|RFR)')
-        quantity_pattern = re.compile(r'\s(0\.\d{2,3}?)(\d*\.\d{2})')
+        quantity_pattern = re.compile(r'\s(0\.\d{2,3}?)\s*(\d*\.\d{2})')
         for line in lines:
             if "Amount Quantity Avg PPU" in line or line.startswith("Total Fuel"):
                 parsing_active = False; continue
@@ -71,13 +70,12 @@ def _haversine_mi(p1, p2):
     a = sin(dlat / 2)**2 + cos(lat1)*cos(lat2)*sin(dlon / 2)**2
     return 2 * R * atan2(sqrt(a), sqrt(1 - a))
 
-def _calculate_state_miles_for_route(origin: str, dest: str, states_gdf) -> dict[str, float]:
+def _calculate_state_miles_for_route(origin: str, dest: str, states_gdf, google_total: float | None) -> dict[str, float]:
+    """Split a route's Google total (looked up beforehand, see _route_total) across the states it crosses."""
     from geopy.geocoders import Nominatim
     geocoder = Nominatim(user_agent="guard_angel_ifta", timeout=10)
     try:
         if origin.strip().lower() == dest.strip().lower(): return {}
-
-        google_total = mileage_browser.get_miles(origin, dest)
         if google_total is None: google_total = 0
 
         state1_abbr = origin.split(',')[-1].strip()
@@ -116,19 +114,41 @@ def _calculate_state_miles_for_route(origin: str, dest: str, states_gdf) -> dict
 
 # Make sure to add the helper function create_progress_bar from above!
 
+async def prefetch_route_miles(routes, on_progress=None):
+    """Look up the Google total of every distinct route at once, as many in parallel as the browser pool allows.
+
+    Results land in route_cache, so the per-route state split below never waits on a browser for them.
+    """
+    unique = list(dict.fromkeys((o, d) for o, d in routes if o.strip().lower() != d.strip().lower() and route_cache.get((o, d)) is None))
+    for done, lookup in enumerate(asyncio.as_completed([aio.run("browser", route_cache.miles, route, mileage_browser.get_miles) for route in unique]), 1):
+        await lookup
+        if on_progress and (done % 5 == 0 or done == len(unique)): await on_progress(done, len(unique))
+
+async def _route_total(origin: str, dest: str) -> float | None:
+    # Only a cache miss takes a browser slot; the state split itself is not browser work.
+    if origin.strip().lower() == dest.strip().lower(): return None
+    if (cached := route_cache.get((origin, dest))) is not None: return cached
+    try: return await aio.run("browser", route_cache.miles, (origin, dest), mileage_browser.get_miles)
+    except Exception as e: print(f"Error looking up miles for {origin}->{dest}: {e}"); return None
+
 async def calculate_quarterly_miles(driver: str, quarter: int, update: Update, context: ContextTypes.DEFAULT_TYPE) -> str:
     # This function must now be async
     try:
-        routes = sheets.get_start_finish_for_ifta(quarter, driver)
+        routes = await aio.sheets.get_start_finish_for_ifta(quarter, driver)
         if not routes: return f"No routes found for driver {driver}, Q{quarter}."
 
         total_routes = len(routes)
-        states_gdf = gpd.read_file(settings.states_geojson_path)
+        states_gdf = await aio.run("cpu", gpd.read_file, settings.states_geojson_path)
         grand_total = defaultdict(float)
 
         # This will hold the message we are editing
         q = update.callback_query
 
+        async def show_lookup_progress(done, total):
+            try: await q.edit_message_text(create_progress_bar(done, total, label="Looking up route miles..."), parse_mode="Markdown")
+            except Exception as e: print(f"Could not edit message: {e}")
+        await prefetch_route_miles(routes, show_lookup_progress)
+
         # Loop through the routes and update the progress bar
         for i, (origin, destination) in enumerate(routes):
             # Only edit the message every 5 routes or on the first/last to avoid hitting API limits
@@ -142,7 +162,8 @@ async def calculate_quarterly_miles(driver: str, quarter: int, update: Update, c
                     print(f"Could not edit message: {e}")
 
             print(f"Processing route {i+1}/{total_routes}: {origin} -> {destination}")
-            per_route = _calculate_state_miles_for_route(origin, destination, states_gdf)
+            google_total = await _route_total(origin, destination)
+            per_route = await aio.run("cpu", _calculate_state_miles_for_route, origin, destination, states_gdf, google_total)
             for st, mi in per_route.items():
                 grand_total[st] += mi
 
@@ -1,12 +1,15 @@
 from dataclasses import dataclass
 from decimal import Decimal
 from datetime import date, timedelta
-import os, re, io, tempfile, shutil
+import os, re, io
+from concurrent.futures import ThreadPoolExecutor
 
-from .org_config import get_org
-from .pdf_tools import build_invoice_pdf, merge_pdfs
+from . import blob_cache, invoice_template, scheduler
+from .pdf_tools import merge_pdf_bytes
 from .auth import drive_service as dr
 from .auth import spreadsheet_service as sh
+from .sheet_mirror import mirror
+from .load_row import COLUMNS, INVOICE_AMOUNTS, LoadRow, decode_rows
 from ..config import settings
 
 # Column mapping (0-based) from env, with sensible defaults matching your legacy
@@ -34,41 +37,32 @@ def _extract_drive_id(link: str) -> str:
     raise ValueError(f"Cannot parse file id from: {link}")
 
 def download_drive_file(file_id: str, dest_path: str):
-    req = dr.files().get_media(fileId=file_id)
-    with open(dest_path, "wb") as f:
-        downloader = __import__("googleapiclient.http", fromlist=['MediaIoBaseDownload']).http.MediaIoBaseDownload(f, req)
-        done = False
-        while not done:
-            status, done = downloader.next_chunk()
+    blob_cache.copy_to(file_id, dest_path)
 
 def upload_drive_file(local_path: str, parent_folder_id: str|None) -> str|None:
     if not parent_folder_id: return None
     file_metadata = {"name": os.path.basename(local_path), "parents": [parent_folder_id]}
     media = __import__("googleapiclient.http", fromlist=['MediaFileUpload']).http.MediaFileUpload(local_path, mimetype="application/pdf")
-    file = dr.files().create(body=file_metadata, media_body=media, fields="id, webViewLink").execute()
+    file = scheduler.execute(dr.files().create(body=file_metadata, media_body=media, fields="id, webViewLink"), api="drive", retry_on=scheduler.REFUSED_STATUSES)
     return file.get("webViewLink")
 
-def load_row(driver: str, row_idx_1based: int):
-    rng = f"{driver}!A{row_idx_1based}:Z{row_idx_1based}"
-    resp = sh.spreadsheets().values().get(spreadsheetId=settings.spreadsheet_id, range=rng).execute()
-    vals = resp.get("values", [[]])
-    return vals[0] if vals else []
+# INV_COL_* overrides expressed on the shared LoadRow layout
+_INV_FIELDS = {"PU_DATE": "pu_date", "DEL_DATE": "del_date", "PU_CITY": "pu_location", "DEL_CITY": "del_location",
+               "BROKER": "broker", "CONFIRM_LINK": "rc_link", "GROSS": "gross", "POD_LINK": "pod_link",
+               "INVOICE_NO": "invoice_no", "INVOICE_URL": "invoice_link"}
+_LAYOUT = {**COLUMNS, **{_INV_FIELDS[k]: v for k, v in INV_COLS.items()}}
 
-def make_invoice_payload(row: list[str], currency="USD"):
-    g = INV_COLS
-    pu_date  = row[g["PU_DATE"]]      if len(row)>g["PU_DATE"] else ""
-    del_date = row[g["DEL_DATE"]]     if len(row)>g["DEL_DATE"] else ""
-    pu_city  = row[g["PU_CITY"]]      if len(row)>g["PU_CITY"] else ""
-    del_city = row[g["DEL_CITY"]]     if len(row)>g["DEL_CITY"] else ""
-    broker   = row[g["BROKER"]]       if len(row)>g["BROKER"] else ""
-    gross    = row[g["GROSS"]]        if len(row)>g["GROSS"] else "0"
-    inv_no   = row[g["INVOICE_NO"]]   if len(row)>g["INVOICE_NO"] else ""
-    confirm  = row[g["CONFIRM_LINK"]] if len(row)>g["CONFIRM_LINK"] else ""
-    pod      = row[g["POD_LINK"]]     if len(row)>g["POD_LINK"] else ""
+def load_row(driver: str, row_idx_1based: int) -> LoadRow:
+    return decode_rows([mirror.row(driver, row_idx_1based)], row_idx_1based, _LAYOUT)[0]
+
+def make_invoice_payload(load: LoadRow, currency="USD"):
+    pu_date, del_date = load.pu_date_text, load.del_date_text
+    pu_city, del_city, broker = load.pu_location, load.del_location, load.broker
+    inv_no, confirm, pod = load.invoice_no, load.rc_link, load.pod_link
 
     # Minimal single-line item: "Freight PU->DEL"
     desc = f"Freight {pu_city} ({pu_date}) → {del_city} ({del_date}) | Broker: {broker}"
-    total = Decimal(str(gross or "0")).quantize(Decimal("0.01"))
+    total = load.gross.quantize(Decimal("0.01"))
     item = {"description": desc, "quantity": 1, "unit_price": total, "line_total": total}
 
     payload = {
@@ -90,33 +84,22 @@ def make_invoice_payload(row: list[str], currency="USD"):
     }
     return payload
 
+def _fetch_part(link: str) -> memoryview | None:
+    try: return blob_cache.view(_extract_drive_id(link)) if link else None
+    except Exception: return None  # continue without the missing part
+
 def generate_and_merge_invoice(driver: str, row_idx_1based: int, out_dir: str, currency: str):
     row = load_row(driver, row_idx_1based)
+    row.check_amounts(driver, INVOICE_AMOUNTS)
     inv  = make_invoice_payload(row, currency=currency)
-    org  = get_org()
     os.makedirs(out_dir, exist_ok=True)
 
-    tmp = tempfile.mkdtemp(prefix="ga_inv_")
-    try:
-        inv_pdf = os.path.join(tmp, f"Invoice_{inv['invoice_no']}.pdf")
-        build_invoice_pdf(org, inv, inv_pdf)
-
-        # Download RC + POD
-        parts = [inv_pdf]
-        for key, fname in [("confirm","RC_for_invoice.pdf"), ("pod","POD_for_invoice.pdf")]:
-            link = inv["links"].get(key)
-            if link:
-                try:
-                    fid = _extract_drive_id(link)
-                    local = os.path.join(tmp, fname)
-                    download_drive_file(fid, local)
-                    parts.append(local)
-                except Exception as e:
-                    # continue without the missing part
-                    pass
+    # Render the invoice page while RC and POD download; merge from memory.
+    with ThreadPoolExecutor(max_workers=3, thread_name_prefix="ga-inv") as pool:
+        page = pool.submit(invoice_template.render_load, row, driver)
+        rc, pod = (pool.submit(_fetch_part, inv["links"].get(key)) for key in ("confirm", "pod"))
+        parts = [p for p in (page.result(), rc.result(), pod.result()) if p]
 
-        out_path = os.path.join(out_dir, f"Invoice_{inv['invoice_no']}_MC_1294648.pdf")
-        merge_pdfs(parts, out_path)
-        return out_path
-    finally:
-        shutil.rmtree(tmp, ignore_errors=True)
+    out_path = os.path.join(out_dir, f"Invoice_{inv['invoice_no']}_MC_1294648.pdf")
+    merge_pdf_bytes(parts, out_path)
+    return out_path
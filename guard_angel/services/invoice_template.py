@@ -0,0 +1,159 @@
+from __future__ import annotations
+from datetime import datetime
+import os, threading, zlib
+import fitz
+from fpdf import FPDF
+from fpdf.fonts import CORE_FONTS_CHARWIDTHS
+from .load_row import LoadRow
+from ..config import settings
+
+# Invoice page = a precompiled template + per-load text.
+# Everything that is the same on every invoice (company header, table grid and
+# labels, payment info, check mailing address) is drawn once with FPDF into two
+# template pages: the block above the broker address and the block below it.
+# Their content streams are kept and every invoice is assembled from them
+# directly: the lower block is shifted down by the address height with a `cm`
+# and only the per-load fields are stamped as text. No layout work is repeated,
+# so a render costs what its fields cost. Coordinates are in mm from the top
+# left, like FPDF's; fonts are the PDF core fonts under WinAnsiEncoding, as
+# before, so text is written as cp1252 and broker addresses are wrapped the way
+# multi_cell did; an address too long for the space above the lower block is
+# set in a smaller size (clipped only if it still does not fit).
+MM = 72 / 25.4
+TEAL, BLACK = (25, 126, 134), (0, 0, 0)
+PAGE_W, PAGE_H = 210, 297
+TOP_H, BLOCK_H = 50, 191
+LINE_H = 5
+ADDRESS_W = 188  # mm; multi_cell(0, 5) between 10 mm margins, less 1 mm padding on each side
+ADDRESS_H = PAGE_H - TOP_H - BLOCK_H  # mm left for the broker address (11 lines at 12 pt)
+ADDRESS_SIZES = (12, 11, 10, 9, 8)  # pt; a long address is set smaller, and clipped only below the last size
+_BASE_FONTS = {'helvetica': 'Helvetica', 'helveticaB': 'Helvetica-Bold', 'times': 'Times-Roman', 'timesI': 'Times-Italic'}
+
+_lock = threading.Lock()
+_template: tuple[bytes, bytes, dict[str, str]] | None = None
+_addresses: dict[str, tuple[float, str]] = {}
+
+def _build_pages() -> bytes:
+    pdf = FPDF('P', 'mm', 'A4'); pdf.set_auto_page_break(False); pdf.set_margins(10, 0, 10)
+    # page 0: header, title, BILL TO label
+    pdf.add_page(format=(PAGE_W, TOP_H)); pdf.set_xy(10, 10)
+    header_text = ('Kolobok Inc.\n9063 Caloosa Rd\nFort Myers, FL 33967\n239-293-1919 or 312-535-3912\nchrisribas89@gmail.com')
+    pdf.set_font('times', '', 12); pdf.multi_cell(0, 5, header_text, align='L')
+    pdf.set_font('helvetica', 'B', 16); pdf.set_text_color(*TEAL); pdf.cell(0, 10, 'INVOICE', ln=True, align='L')
+    pdf.set_font('helvetica', 'B', 12); pdf.set_text_color(*BLACK); pdf.cell(50, 5, 'BILL TO', ln=1)
+    # page 1: everything below the broker address, starting at the DATE row
+    pdf.add_page(format=(PAGE_W, BLOCK_H)); pdf.set_xy(10, 0)
+    pdf.set_font('helvetica', 'B', 12); pdf.cell(160, 5, 'DATE', ln=1, align='R')
+    pdf.set_font('helvetica', '', 12); pdf.cell(32, 30, 'TRK#/DRIVER', ln=0); pdf.cell(63, 30, '', ln=0); pdf.cell(35, 30, 'LOAD/ORDER #', ln=1)
+    pdf.cell(0, 8, 'LOAD DESCRIPTION', ln=1, border=1, align='C')
+    pdf.set_font('helvetica', '', 10); pdf.set_text_color(*TEAL); pdf.cell(10, 8, 'SO', border=1); pdf.cell(160, 8, 'ADDRESS', border=1); pdf.cell(20, 8, 'DATE', ln=1, border=1)
+    pdf.set_text_color(*BLACK)
+    for label in ('PU', 'DEL'): pdf.cell(10, 10, label, border=1); pdf.cell(160, 10, '', border=1); pdf.cell(20, 10, '', ln=1, border=1)
+    for label in ('LUMPER', 'BALANCE DUE'): pdf.set_text_color(*TEAL); pdf.cell(95, 8, label, border=1); pdf.cell(95, 8, '', ln=1, border=1)
+    pdf.cell(0, 15, 'PAYMENT INFO:', ln=1, border=1, align='C')
+    rows = [('Type of account:', 'Checking'), ('Name as it appears on Bank Account:', settings.company_payee_name), ('Bank Name:', settings.company_bank_name),
+            ('Financial institution phone number:', settings.company_bank_phone), ('Banking Routing / Transfer Number (9 digits):', settings.company_routing_number),
+            ('Bank Account Number:', settings.company_account_number)]
+    for label, value in rows:
+        pdf.set_text_color(*TEAL); pdf.set_font('helvetica', '', 10); pdf.cell(95, 8, label, border=1)
+        pdf.set_text_color(*BLACK); pdf.set_font('helvetica', 'B', 10); pdf.cell(95, 8, value or 'N/A', ln=1, border=1)
+    pdf.set_font('helvetica', '', 10); pdf.cell(0, 15, 'PLEASE USE THIS MAIL ADDRESS FOR CHECKS:', ln=1, align='C')
+    pdf.set_font('helvetica', 'B', 10); pdf.cell(0, 8, '9063 Caloosa Rd', ln=1, align='C'); pdf.cell(0, 8, 'Fort Myers, FL 33967', ln=1, align='C')
+    pdf.set_font('helvetica', '', 8); pdf.cell(0, 10, 'Thank you!', ln=1, align='C')
+    return bytes(pdf.output())
+
+def template() -> tuple[bytes, bytes, dict[str, str]]:
+    """(top block ops, lower block ops, {resource name: base font}), built on first use."""
+    global _template
+    with _lock:
+        if _template is None:
+            doc = fitz.open("pdf", _build_pages()); fonts = {}
+            for page in doc:
+                for xref, ext, kind, base, name, encoding in page.get_fonts(): fonts[name] = base
+            _template = (doc[0].read_contents(), doc[1].read_contents(), fonts)
+            doc.close()
+        return _template
+
+def _address(broker: str) -> tuple[str, bool]:
+    """Text of ./customers/<broker>.txt (re-read only when the file changes) and whether it was found."""
+    path = f'./customers/{broker}.txt'
+    try: mtime = os.stat(path).st_mtime
+    except OSError: return f"{broker}\n(Address file not found)", False
+    cached = _addresses.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path) as f: cached = _addresses[path] = (mtime, f.read())
+    return cached[1], True
+
+def _width(raw: bytes, font: str, size: float) -> float:
+    """Width in mm of cp1252 `raw` in a core font."""
+    widths = CORE_FONTS_CHARWIDTHS[font]
+    return sum(widths.get(chr(b), 500) for b in raw) * size / 1000 / MM
+
+def _wrap(text: str, font: str, size: float, width: float) -> list[str]:
+    """`text` broken at spaces into lines no wider than `width` mm, like multi_cell."""
+    lines = []
+    for para in text.split("\n"):
+        line = ""
+        for word in para.split(" "):
+            candidate = f"{line} {word}" if line else word
+            if line and _width(candidate.encode('cp1252', 'replace'), font, size) > width: lines.append(line); line = word
+            else: line = candidate
+        lines.append(line)
+    return lines
+
+def _address_lines(text: str, font: str) -> tuple[list[str], float, float]:
+    """(lines, font size, line height) of the broker address, fitted into ADDRESS_H."""
+    for size in ADDRESS_SIZES:
+        line_h = LINE_H * size / 12; lines = _wrap(text, font, size, ADDRESS_W)
+        if len(lines) * line_h <= ADDRESS_H: return lines, size, line_h
+    keep = int(ADDRESS_H // line_h)
+    return lines[:keep - 1] + [lines[keep - 1] + ' ...'], size, line_h
+
+def _text(x, y, w, h, text, font='helvetica', size=10, align='L') -> bytes:
+    """PDF text op placing `text` the way an FPDF cell(w, h, text, align) at (x, y) would."""
+    raw = str(text).encode('cp1252', 'replace'); width = _width(raw, font, size)
+    dx = w - 1 - width if align == 'R' else (w - width) / 2 if align == 'C' else 1
+    raw = raw.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+    return b'BT /%s %.2f Tf %.2f %.2f Td (%s) Tj ET\n' % (font.encode(), size, (x + dx) * MM, (PAGE_H - y - h / 2 - 0.3 * size / MM) * MM, raw)
+
+def _pdf(content: bytes, fonts: dict[str, str]) -> bytes:
+    """A one-page A4 PDF around `content`, with core fonts under the given resource names."""
+    stream = zlib.compress(content)
+    font_refs = b' '.join(b'/%s %d 0 R' % (name.encode(), 5 + i) for i, name in enumerate(fonts))
+    objects = [b'<< /Type /Catalog /Pages 2 0 R >>', b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+               b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.2f %.2f] /Resources << /Font << %s >> >> /Contents 4 0 R >>' % (PAGE_W * MM, PAGE_H * MM, font_refs),
+               b'<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream' % (len(stream), stream)]
+    objects += [b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>' % base.encode() for base in fonts.values()]
+    out = bytearray(b'%PDF-1.4\n'); offsets = []
+    for n, body in enumerate(objects, 1):
+        offsets.append(len(out)); out += b'%d 0 obj\n%s\nendobj\n' % (n, body)
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1) + b''.join(b'%010d 00000 n \n' % o for o in offsets)
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(out)
+
+def render(invoice_no, driver, load_number, broker, pu, pu_date, deliv, del_date, gross, lumper_kolobok=None, lumper_broker=None) -> bytes:
+    """One invoice page as PDF bytes: the cached template plus this load's fields."""
+    final_gross = float(gross) if gross else 0.0; lumper_text = '<none>'
+    if lumper_kolobok: lumper_text = f'(Kolobok Inc paid) ${lumper_kolobok}'; final_gross += float(lumper_kolobok)
+    elif lumper_broker: lumper_text = f'(Broker paid) ${lumper_broker}'
+    text, found = _address(broker); font = 'times' if found else 'timesI'
+    lines, size, line_h = _address_lines(text, font)
+    y0 = TOP_H + line_h * len(lines)
+    top, bottom, template_fonts = template()
+    # The template pages are shorter than A4; move each block to where it sits on the page.
+    ops = [b'q 1 0 0 1 0 %.2f cm\n%s\nQ\n' % ((PAGE_H - TOP_H) * MM, top),
+           b'q 1 0 0 1 0 %.2f cm\n%s\nQ\n' % ((PAGE_H - y0 - BLOCK_H) * MM, bottom), b'0 g\n',
+           _text(60, 45, 140, 5, f'INVOICE # {invoice_no}', 'helveticaB', 12, align='R')]
+    ops += [_text(10, TOP_H + line_h * i, 190, line_h, line, font, size) for i, line in enumerate(lines)]
+    ops += [_text(170, y0, 30, 5, datetime.now().strftime("%m-%d-%Y"), 'helvetica', 12, align='R'),
+            _text(42, y0 + 5, 63, 30, driver, 'helvetica', 12), _text(140, y0 + 5, 60, 30, load_number, 'helvetica', 12),
+            _text(20, y0 + 51, 160, 10, pu), _text(180, y0 + 51, 20, 10, pu_date),
+            _text(20, y0 + 61, 160, 10, deliv), _text(180, y0 + 61, 20, 10, del_date),
+            _text(105, y0 + 71, 95, 8, lumper_text, align='R'),
+            _text(105, y0 + 79, 95, 8, f'${final_gross:,.2f}', 'helveticaB', 12, align='R')]
+    return _pdf(b''.join(ops), {**template_fonts, **_BASE_FONTS})
+
+def render_load(load: LoadRow, driver: str) -> bytes:
+    return render(load.invoice_no, driver, load.load_number, load.broker, load.pu_location, load.pu_date_text,
+                  load.del_location, load.del_date_text, load.gross, load.lumper_kolobok, load.lumper_broker)
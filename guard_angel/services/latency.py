@@ -0,0 +1,54 @@
+from __future__ import annotations
+from contextlib import contextmanager
+import bisect, threading, time
+
+# In-process latency histograms, one per named phase ("maps_ifta.results",
+# "browser.start", ...). Fixed log-spaced buckets, so recording is a bisect and
+# an increment; percentiles are read off the buckets (upper bound of the
+# bucket the percentile falls in, capped at the max). `/latency` in the bot shows the report.
+BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 60)  # seconds, upper bounds
+
+class Histogram:
+    __slots__ = ("counts", "n", "total", "max")
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1); self.n = 0; self.total = 0.0; self.max = 0.0
+
+    def add(self, seconds: float):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.n += 1; self.total += seconds; self.max = max(self.max, seconds)
+
+    def quantile(self, q: float) -> float:
+        seen, rank = 0, q * self.n
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank and c: return min(BUCKETS[i], self.max) if i < len(BUCKETS) else self.max
+        return 0.0
+
+_lock = threading.Lock()
+_hists: dict[str, Histogram] = {}
+
+def record(name: str, seconds: float):
+    with _lock:
+        (_hists.get(name) or _hists.setdefault(name, Histogram())).add(seconds)
+
+@contextmanager
+def phase(name: str):
+    """Time the block and record it under `name` (also when it raises)."""
+    start = time.perf_counter()
+    try: yield
+    finally: record(name, time.perf_counter() - start)
+
+def snapshot() -> dict[str, dict]:
+    with _lock:
+        return {name: {"n": h.n, "mean": h.total / h.n, "p50": h.quantile(0.5), "p95": h.quantile(0.95), "max": h.max, "buckets": list(h.counts)}
+                for name, h in sorted(_hists.items()) if h.n}
+
+def reset():
+    with _lock: _hists.clear()
+
+def report() -> str:
+    stats = snapshot()
+    if not stats: return "No timings recorded yet."
+    lines = [f"{'phase':<24}{'n':>6}{'mean':>8}{'p50≤':>8}{'p95≤':>8}{'max':>8}"]
+    lines += [f"{name[:23]:<24}{s['n']:>6}{s['mean']:>7.2f}s{s['p50']:>7.2f}s{s['p95']:>7.2f}s{s['max']:>7.2f}s" for name, s in stats.items()]
+    return "\n".join(lines)
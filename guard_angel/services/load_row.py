@@ -0,0 +1,112 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+# Column layout of a driver tab (0-based), shared by every reader of load rows.
+COLUMNS = {
+    "pu_date": 0, "pu_time": 1, "del_date": 2, "del_time": 3,
+    "pu_location": 4, "del_location": 5, "broker": 6, "load_number": 7,
+    "rc_link": 8, "gross": 9, "miles": 10, "rpm": 11, "notes": 12,
+    "pod_link": 13, "lumper_kolobok": 14, "lumper_broker": 15, "cc_emails": 16,
+    "invoice_link": 17, "invoice_no": 18, "accounting_email": 19, "commission": 20,
+    "empty_time": 21, "statement_link": 23, "insurance_period": 24,
+    "deduction": 25, "deduction_label": 26,
+}
+_DATE_FMTS = ("%m/%d/%Y", "%Y-%m-%d")
+AMOUNTS = ("gross", "miles", "rpm", "lumper_kolobok", "lumper_broker", "commission", "deduction")
+STATEMENT_AMOUNTS = ("gross", "miles", "commission", "deduction")
+INVOICE_AMOUNTS = ("gross", "lumper_kolobok", "lumper_broker")
+
+def _letter(idx: int) -> str:
+    """A1 column letter for a 0-based index (0 -> 'A', 26 -> 'AA')."""
+    letter, idx = "", idx + 1
+    while idx: idx, r = divmod(idx - 1, 26); letter = chr(65 + r) + letter
+    return letter
+
+def _date(s: str) -> date | None:
+    s = s.strip()
+    for f in _DATE_FMTS:
+        try: return datetime.strptime(s, f).date()
+        except ValueError: pass
+    return None
+
+def _money(s: str) -> Decimal | None:
+    s = s.replace(",", "").replace("$", "").strip()
+    if not s: return None
+    try: return Decimal(s)
+    except InvalidOperation: return None
+
+def _amount(s: str) -> Decimal:
+    # Empty and unparseable both read as 0 here; unparseable cells are listed in LoadRow.invalid.
+    return _money(s) or Decimal("0")
+
+@dataclass(slots=True)
+class LoadRow:
+    """One load (one row of a driver tab), with dates and money parsed once."""
+    row: int
+    pu_date_text: str
+    pu_date: date | None
+    pu_time: str
+    del_date_text: str
+    del_date: date | None
+    del_time: str
+    pu_location: str
+    del_location: str
+    broker: str
+    load_number: str
+    rc_link: str
+    gross: Decimal
+    miles: Decimal
+    rpm: Decimal
+    notes: str
+    pod_link: str
+    lumper_kolobok: Decimal | None
+    lumper_broker: Decimal | None
+    cc_emails: list[str] = field(default_factory=list)
+    invoice_link: str = ""
+    invoice_no: str = ""
+    accounting_email: str = ""
+    commission: Decimal = Decimal("0")
+    empty_time: str = ""
+    statement_link: str = ""
+    insurance_period: str = ""
+    deduction: Decimal | None = None
+    deduction_label: str = ""
+    invalid: tuple[tuple[str, str, str], ...] = ()  # (field, column letter, text) of amounts that are not numbers
+
+    def check_amounts(self, driver: str, names: tuple[str, ...] = AMOUNTS):
+        """Raise ValueError naming the driver, row and column of any of `names` whose cell is not a number."""
+        bad = [f"{letter} ({name}) = {text!r}" for name, letter, text in self.invalid if name in names]
+        if bad: raise ValueError(f"{driver} row {self.row}: not a number in column " + ", ".join(bad))
+
+    @property
+    def commission_amount(self) -> Decimal: return self.gross * self.commission / 100
+
+    @property
+    def net(self) -> Decimal: return self.gross - self.commission_amount
+
+def decode_rows(values: list[list[str]], first_row: int = 1, columns: dict[str, int] = COLUMNS) -> list[LoadRow]:
+    """Turn a Sheets `values` matrix into LoadRows; each column is converted in a single pass.
+
+    Date text is kept next to the parsed date because statements print it as entered.
+    Amount cells that are filled but not numbers are recorded in `invalid` (see check_amounts).
+    """
+    if not values: return []
+    width = max(columns.values()) + 1
+    cols = list(zip(*(list(r[:width]) + [""] * (width - len(r)) for r in values)))
+    c = {name: cols[idx] for name, idx in columns.items()}
+    amounts = [(name, _letter(columns[name])) for name in AMOUNTS]
+    invalid = [tuple((name, letter, text) for (name, letter), text in zip(amounts, texts) if text.strip() and _money(text) is None)
+               for texts in zip(*(c[name] for name, _ in amounts))]
+    return [LoadRow(*fields) for fields in zip(
+        range(first_row, first_row + len(values)),
+        c["pu_date"], map(_date, c["pu_date"]), c["pu_time"],
+        c["del_date"], map(_date, c["del_date"]), c["del_time"],
+        c["pu_location"], c["del_location"], c["broker"], c["load_number"], c["rc_link"],
+        map(_amount, c["gross"]), map(_amount, c["miles"]), map(_amount, c["rpm"]),
+        c["notes"], c["pod_link"], map(_money, c["lumper_kolobok"]), map(_money, c["lumper_broker"]),
+        map(str.split, c["cc_emails"]), c["invoice_link"], c["invoice_no"], c["accounting_email"],
+        map(_amount, c["commission"]), c["empty_time"], c["statement_link"], c["insurance_period"],
+        map(_money, c["deduction"]), c["deduction_label"], invalid,
+    )]
@@ -0,0 +1,102 @@
+from __future__ import annotations
+import io, logging
+from typing import Iterable, Optional
+from ..config import settings
+
+# PDF merge / text extraction behind one interface.
+# PyMuPDF (MuPDF, C) is the default: merging is a page-tree copy and text
+# comes out of the C extractor (scripts/bench_pdf_backend.py: merge ~1.8x,
+# 12-page fuel statement text ~1.3x, no gain on one page). PyPDF2 stays as the
+# fallback: it is used when PyMuPDF is missing, when PDF_BACKEND=pypdf2, and
+# for any single document PyMuPDF refuses to open. Sources are bytes / memoryviews / paths throughout.
+log = logging.getLogger(__name__)
+LINE_TOLERANCE = 3.0  # pt; words whose vertical centres are this close are one line
+
+def _is_data(src) -> bool:
+    return isinstance(src, (bytes, bytearray, memoryview))
+
+class PyMuPDFBackend:
+    name = "pymupdf"
+    def __init__(self):
+        import fitz
+        self.fitz = fitz
+
+    def _open(self, src):
+        return self.fitz.open("pdf", src) if _is_data(src) else self.fitz.open(src)
+
+    def merge(self, parts: Iterable) -> bytes:
+        out = self.fitz.open()
+        for p in parts:
+            with self._open(p) as doc: out.insert_pdf(doc)
+        try: return out.tobytes(deflate=True)
+        finally: out.close()
+
+    def page_texts(self, src, pages: Optional[int] = None) -> list[str]:
+        # Words regrouped into visual lines, joined by single spaces: table rows come
+        # out as one line each, which is what the statement parsers expect.
+        with self._open(src) as doc:
+            return [self._lines(doc[i]) for i in range(min(pages or len(doc), len(doc)))]
+
+    @staticmethod
+    def _lines(page) -> str:
+        words = sorted(((y0 + y1) / 2, x0, w) for x0, y0, x1, y1, w, *_ in page.get_text("words"))
+        lines, line, y = [], [], None
+        for mid, x0, w in words:
+            if y is not None and mid - y > LINE_TOLERANCE: lines.append(line); line = []
+            if not line: y = mid
+            line.append((x0, w))
+        if line: lines.append(line)
+        return "\n".join(" ".join(w for _, w in sorted(line)) for line in lines)
+
+class PyPDF2Backend:
+    name = "pypdf2"
+    def __init__(self):
+        import PyPDF2
+        self.PyPDF2 = PyPDF2
+
+    @staticmethod
+    def _stream(src):
+        return io.BytesIO(src) if _is_data(src) else src
+
+    def merge(self, parts: Iterable) -> bytes:
+        merger = self.PyPDF2.PdfMerger(); out = io.BytesIO()
+        for p in parts: merger.append(self._stream(p))
+        merger.write(out); merger.close()
+        return out.getvalue()
+
+    def page_texts(self, src, pages: Optional[int] = None) -> list[str]:
+        reader = self.PyPDF2.PdfReader(self._stream(src))
+        return [page.extract_text() or "" for page in reader.pages[:pages]]
+
+_backends: dict[str, object] = {}
+
+def get(name: Optional[str] = None):
+    """Backend by name ('pymupdf' | 'pypdf2'); default from PDF_BACKEND, PyPDF2 if PyMuPDF is not installed."""
+    name = (name or settings.pdf_backend).lower()
+    if name not in _backends:
+        try: _backends[name] = PyPDF2Backend() if name == "pypdf2" else PyMuPDFBackend()
+        except ImportError:
+            log.warning("PyMuPDF not available, using PyPDF2"); _backends[name] = get("pypdf2")
+    return _backends[name]
+
+def _with_fallback(method: str, backend: Optional[str], *args):
+    primary = get(backend)
+    try: return getattr(primary, method)(*args)
+    except Exception as e:
+        if primary.name == "pypdf2": raise
+        log.warning("PyMuPDF %s failed (%s), retrying with PyPDF2", method, e)
+        return getattr(get("pypdf2"), method)(*args)
+
+def merge(parts: Iterable, out_path: Optional[str] = None, backend: Optional[str] = None) -> bytes:
+    """Concatenate PDFs (bytes / memoryviews / paths) into one; optionally also write `out_path`."""
+    data = _with_fallback("merge", backend, list(parts))
+    if out_path:
+        with open(out_path, "wb") as f: f.write(data)
+    return data
+
+def page_texts(src, pages: Optional[int] = None, backend: Optional[str] = None) -> list[str]:
+    """Text of each page (only the first `pages` if given), one visual line per text line."""
+    return _with_fallback("page_texts", backend, src, pages)
+
+def text(src, backend: Optional[str] = None) -> str:
+    return "".join(t + "\n" for t in page_texts(src, backend=backend))
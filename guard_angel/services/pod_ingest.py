@@ -0,0 +1,74 @@
+from __future__ import annotations
+import io
+from concurrent.futures import as_completed
+from PIL import Image, ImageOps
+from . import workers
+from ..config import settings
+
+# POD ingest: phone photos (and photo-heavy PDFs) normalized before merging.
+# Each page is auto-rotated from EXIF, fitted to a Letter page at POD_DPI,
+# optionally turned grayscale and re-encoded as JPEG, then wrapped into a PDF
+# page without re-encoding (img2pdf). The JPEG quality (then the scale) is
+# stepped down until the whole POD fits in POD_MAX_MB. Files are normalized
+# in the worker processes; small text PDFs pass through untouched.
+PAGE_IN = (8.5, 11)
+QUALITIES = (75, 60, 45, 35)
+MIN_SCALE = 0.5
+
+def _fit(size: tuple[int, int], dpi: int) -> float:
+    """Scale factor that fits an image (either orientation) on a Letter page at `dpi`, never upscaling."""
+    short, long = sorted(size)
+    return min(1.0, PAGE_IN[0] * dpi / short, PAGE_IN[1] * dpi / long)
+
+def _jpeg(im: Image.Image, quality: int) -> bytes:
+    buf = io.BytesIO(); im.save(buf, "JPEG", quality=quality, optimize=True, progressive=True)
+    return buf.getvalue()
+
+def _encode(im: Image.Image, dpi: int, budget: int) -> bytes:
+    import img2pdf
+    scale = 1.0; base = im
+    while True:
+        for quality in QUALITIES:
+            data = _jpeg(im, quality)
+            if len(data) <= budget: break
+        if len(data) <= budget or scale * 0.8 < MIN_SCALE: break
+        scale *= 0.8; im = base.resize((max(1, round(base.width * scale)), max(1, round(base.height * scale))), Image.LANCZOS)
+    # The page keeps the size the photo had at `dpi`, so downscaling for the budget does not shrink the page.
+    return img2pdf.convert(data, layout_fun=img2pdf.get_fixed_dpi_layout_fun((dpi * scale, dpi * scale)))
+
+def _image(data: bytes, dpi: int, grayscale: bool, budget: int) -> list[bytes]:
+    im = Image.open(io.BytesIO(data)); mode = "L" if grayscale else "RGB"
+    # JPEG decoding can scale by 1/2..1/8 for free; ask for at least the size we keep.
+    scale = _fit(im.size, dpi); im.draft(mode, (round(im.width * scale), round(im.height * scale)))
+    im = ImageOps.exif_transpose(im)
+    if im.mode != mode: im = im.convert(mode)
+    scale = _fit(im.size, dpi)
+    if scale < 1: im = im.resize((round(im.width * scale), round(im.height * scale)), Image.LANCZOS)
+    return [_encode(im, dpi, budget)]
+
+def _pdf(data: bytes, dpi: int, grayscale: bool, budget: int) -> list[bytes]:
+    if len(data) <= budget: return [data]
+    # Over budget means scanned/photographed pages: rasterize each at `dpi` and re-encode.
+    import fitz
+    pages = []
+    with fitz.open("pdf", data) as doc:
+        for page in doc:
+            pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY if grayscale else fitz.csRGB)
+            im = Image.frombytes("L" if grayscale else "RGB", (pix.width, pix.height), pix.samples)
+            pages.append(_encode(im, dpi, budget // len(doc)))
+    return pages if sum(map(len, pages)) < len(data) else [data]
+
+def normalize(data: bytes, dpi: int, grayscale: bool, budget: int) -> list[bytes]:
+    """One uploaded POD file (image or PDF) as normalized PDF parts; runs in a worker process."""
+    return (_pdf if data[:4] == b'%PDF' else _image)(data, dpi, grayscale, budget)
+
+def normalize_all(files: list[bytes]) -> tuple[list[bytes], list[Exception]]:
+    """Normalize every uploaded file in parallel; pages come back in upload order, plus the files that failed."""
+    if not files: return [], []
+    budget = settings.pod_max_mb * 1024 * 1024 // len(files)
+    futures = {workers.processes().submit(normalize, data, settings.pod_dpi, settings.pod_grayscale, budget): i for i, data in enumerate(files)}
+    pages: list[list[bytes]] = [[] for _ in files]; errors = []
+    for f in as_completed(futures):
+        try: pages[futures[f]] = f.result()
+        except Exception as e: errors.append(e)
+    return [page for file_pages in pages for page in file_pages], errors
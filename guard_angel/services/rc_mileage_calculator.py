@@ -1,48 +1,40 @@
 import re
-import time
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.firefox.service import Service
-from selenium.webdriver.firefox.options import Options
-from selenium.webdriver.support.wait import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from ..config import settings
+from . import latency
+from .browser import browser_pool, entered, trip_text, wait_for_trip
 
 # Using your original, reliable 3-field URL
 URL = "https://www.google.com/maps/dir/Fort+Myers,+FL/Atlanta,+GA/Baltimore,+MD"
+DISTANCE = r'[\d,]+\s*mi(?:les)?\b'  # "85 mi" or "85 miles", not "12 min"
 
 class MileageBrowser:
-    def __init__(self):
-        self.browser = self._init_browser()
-
-    def _init_browser(self):
-        options = Options()
-        options.headless = True
-        options.profile = settings.firefox_profile_path
-        service = Service(settings.geckodriver_path)
-        browser_instance = webdriver.Firefox(service=service, options=options)
-        browser_instance.get(URL) # Go to the pre-filled URL
-        return browser_instance
+    """Multi-stop Google Maps lookup (deadhead + loaded miles), run in its own tab of a pooled browser."""
+    name = "maps_rc"
 
     def get_miles(self, *waypoints: str) -> int | None:
-        try:
-            input_fields = self.browser.find_elements(By.CSS_SELECTOR, "div[id^='directions-searchbox-'] input")
-            
-            # Input new waypoints
-            for i, point in enumerate(waypoints):
-                if i < len(input_fields):
-                    input_field = input_fields[i]
-                    input_field.clear()
-                    input_field.send_keys(point)
-                    if i == len(waypoints) - 1:
-                        input_field.send_keys(Keys.ENTER)
+        with latency.phase(f"{self.name}.total"), browser_pool.session(self.name, URL) as worker: return self._get_miles(worker, *waypoints)
 
-            trip_element = WebDriverWait(self.browser, 20).until(
-                EC.visibility_of_element_located((By.ID, "section-directions-trip-0"))
-            )
-            time.sleep(2)
-            
+    def _get_miles(self, worker, *waypoints: str) -> int | None:
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.common.keys import Keys
+        browser = worker.driver
+        try:
+            input_fields = browser.find_elements(By.CSS_SELECTOR, "div[id^='directions-searchbox-'] input")
+            if entered(worker, waypoints, input_fields) is None:
+                with latency.phase(f"{self.name}.input"):
+                    previous = trip_text(browser)
+
+                    # Input new waypoints
+                    for i, point in enumerate(waypoints):
+                        if i < len(input_fields):
+                            input_field = input_fields[i]
+                            input_field.clear()
+                            input_field.send_keys(point)
+                            if i == len(waypoints) - 1:
+                                input_field.send_keys(Keys.ENTER)
+
+                # Done when the first result shows a distance and is not the previous lookup's.
+                with latency.phase(f"{self.name}.results"): wait_for_trip(worker, previous, DISTANCE, timeout=20, waypoints=waypoints)
+            trip_element = browser.find_element(By.ID, "section-directions-trip-0")
             distance_div_xpath = ".//div[contains(text(), 'mi') and not(contains(text(), 'min'))]"
             distance_div = trip_element.find_element(By.XPATH, distance_div_xpath)
             miles_text = distance_div.text
@@ -55,10 +47,10 @@ class MileageBrowser:
 
         except Exception as e:
             print(f"Error in Selenium mileage calculation: {e}")
-            self.browser.save_screenshot('selenium_error.png')
+            browser.save_screenshot('selenium_error.png')
         return None
 
     def close(self):
-        self.browser.quit()
+        browser_pool.close()
 
 mileage_browser = MileageBrowser()
@@ -0,0 +1,43 @@
+from __future__ import annotations
+from pathlib import Path
+import os, shutil, threading
+import fitz
+from . import blob_cache
+from ..config import settings
+
+# RC page previews for Telegram, cached in .cache/rc_previews.
+# Pages are rendered with PyMuPDF straight from the cached Drive blob, at
+# RC_PREVIEW_DPI and never wider/taller than Telegram shows a photo, and only
+# the first RC_PREVIEW_PAGES pages. Previews are stored per blob
+# ("<fileId>-<version>", see blob_cache), so an edited RC gets new previews
+# and showing the same RC again costs one metadata call.
+_DIR = Path(__file__).resolve().parents[2] / ".cache" / "rc_previews"
+_LOCK = threading.Lock()
+MAX_SIDE = 1280  # px; Telegram downsizes photos beyond this anyway
+KEEP = 200  # preview sets kept on disk, most recently used first
+
+def _render(blob, dest: Path):
+    part = dest.with_name(dest.name + ".part")
+    shutil.rmtree(part, ignore_errors=True); part.mkdir(parents=True)
+    with fitz.open(stream=blob.read(), filetype="pdf") as doc:
+        for i, page in enumerate(doc):
+            if i >= settings.rc_preview_pages: break
+            zoom = min(settings.rc_preview_dpi / 72, MAX_SIDE / max(page.rect.width, page.rect.height))
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            (part / f"{i + 1:03d}.jpg").write_bytes(pix.tobytes("jpeg", jpg_quality=80))
+        (part / "pages").write_text(str(len(doc)))
+    shutil.rmtree(dest, ignore_errors=True); os.replace(part, dest)
+
+def _prune(keep: Path):
+    sets = sorted((p for p in _DIR.iterdir() if p.is_dir() and not p.name.endswith(".part")), key=lambda p: p.stat().st_mtime, reverse=True)
+    for old in sets[KEEP:]:
+        if old != keep: shutil.rmtree(old, ignore_errors=True)
+
+def pages(file_id: str) -> tuple[list[bytes], int]:
+    """(JPEG previews of the first pages, total page count) of a Drive PDF."""
+    with blob_cache.open_blob(file_id) as blob, _LOCK:
+        dest = _DIR / Path(blob.name).name
+        if not (dest / "pages").exists():
+            _render(blob, dest); _prune(keep=dest)
+        else: os.utime(dest)
+        return [p.read_bytes() for p in sorted(dest.glob("*.jpg"))], int((dest / "pages").read_text())
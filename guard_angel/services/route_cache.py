@@ -0,0 +1,60 @@
+from __future__ import annotations
+from pathlib import Path
+from contextlib import contextmanager
+import re, sqlite3, threading, time
+from ..config import settings
+
+# Driving distances we already asked Google Maps for, kept in .cache/routes.sqlite.
+# A route is its chain of waypoints ("fort myers, fl -> atlanta, ga -> ..."),
+# normalized so spelling/spacing variants of the same lane share one entry.
+# Entries older than ROUTE_CACHE_DAYS are looked up again (0 = never expire).
+# All rows are also held in memory, so a hit is a dict lookup.
+_PATH = Path(__file__).resolve().parents[2] / ".cache" / "routes.sqlite"
+_LOCK = threading.Lock()
+_memo: dict[str, tuple[float, float]] | None = None  # key -> (miles, updated_at)
+
+def normalize(place: str | None) -> str:
+    place = re.sub(r"\s*,\s*", ", ", (place or "").strip().lower().replace(".", ""))
+    place = re.sub(r"\s+", " ", place)
+    return re.sub(r", (usa|us|united states)$", "", place).strip(", ")
+
+def key(waypoints) -> str:
+    return " -> ".join(normalize(w) for w in waypoints)
+
+@contextmanager
+def _db():
+    _PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(_PATH)
+    try:
+        with conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS routes (route TEXT PRIMARY KEY, miles REAL NOT NULL, updated_at REAL NOT NULL)")
+            yield conn
+    finally: conn.close()
+
+def _load() -> dict[str, tuple[float, float]]:
+    global _memo
+    if _memo is None:
+        with _db() as conn: _memo = {route: (miles, at) for route, miles, at in conn.execute("SELECT route, miles, updated_at FROM routes")}
+    return _memo
+
+def _fresh(updated_at: float) -> bool:
+    return not settings.route_cache_days or time.time() - updated_at < settings.route_cache_days * 86400
+
+def get(waypoints) -> float | None:
+    with _LOCK: found = _load().get(key(waypoints))
+    if not found or not _fresh(found[1]): return None
+    return int(found[0]) if found[0].is_integer() else found[0]
+
+def put(waypoints, miles: float):
+    route, now = key(waypoints), time.time()
+    with _LOCK:
+        _load()[route] = (float(miles), now)
+        with _db() as conn: conn.execute("INSERT OR REPLACE INTO routes VALUES (?, ?, ?)", (route, float(miles), now))
+
+def miles(waypoints, lookup):
+    """Cached distance of a waypoint chain, else `lookup(*waypoints)` (only real answers, > 0, are stored)."""
+    waypoints = tuple(waypoints)
+    if (cached := get(waypoints)) is not None: return cached
+    result = lookup(*waypoints)
+    if result: put(waypoints, result)
+    return result
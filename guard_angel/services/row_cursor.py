@@ -0,0 +1,47 @@
+from __future__ import annotations
+import threading
+from . import cache, scheduler
+from .auth import spreadsheet_service as sh
+from ..config import settings
+
+# Per-driver "last filled row" cursors, persisted in .cache/last_rows.json
+# under "cursors" as {"<driver>!<column>": row}. A cursor is trusted after a
+# single two-cell probe (row filled, row below empty); only when that fails is
+# the whole column scanned again.
+_LOCK = threading.Lock()
+_cursors: dict[str, int] | None = None
+
+def _load() -> dict[str, int]:
+    global _cursors
+    if _cursors is None: _cursors = dict(cache.load_cache().get("cursors", {}))
+    return _cursors
+
+def _save():
+    data = cache.load_cache(); data["cursors"] = _cursors; cache.save_cache(data)
+
+def _probe(driver: str, column: str, row: int) -> bool:
+    if row < 1:
+        values = scheduler.execute(sh.spreadsheets().values().get(spreadsheetId=settings.spreadsheet_id, range=f"{driver}!{column}1")).get("values", [])
+        return not values
+    values = scheduler.execute(sh.spreadsheets().values().get(spreadsheetId=settings.spreadsheet_id, range=f"{driver}!{column}{row}:{column}{row + 1}")).get("values", [])
+    return len(values) == 1 and bool(values[0]) and bool(values[0][0])
+
+def _scan(driver: str, column: str) -> int:
+    result = scheduler.execute(sh.spreadsheets().values().get(spreadsheetId=settings.spreadsheet_id, range=f"{driver}!{column}:{column}"))
+    return len(result.get("values", []))
+
+def last_row(driver: str, column: str = "A") -> int:
+    key = f"{driver}!{column}"
+    with _LOCK: row = _load().get(key)
+    if row is not None and _probe(driver, column, row): return row
+    row = _scan(driver, column)
+    with _LOCK: _load()[key] = row; _save()
+    return row
+
+def advance(driver: str, row: int, column: str, value) -> None:
+    """Move the cursor forward after this process wrote a non-empty cell."""
+    if value in (None, ""): return
+    key = f"{driver}!{column}"
+    with _LOCK:
+        cursors = _load()
+        if key in cursors and cursors[key] < row: cursors[key] = row; _save()
@@ -0,0 +1,74 @@
+from __future__ import annotations
+import random, socket, ssl, threading, time
+from collections import deque
+from concurrent.futures import Future
+from googleapiclient.errors import HttpError
+from ..config import settings
+
+# Central gate for Google API calls:
+#  * per-minute Sheets read/write quotas (sliding window, callers wait for a slot),
+#  * exponential backoff with full jitter on 429/5xx and dropped connections,
+#  * identical reads already in flight are shared instead of being sent twice.
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# For calls that are not idempotent (append, create): only a 429 proves the request was not applied.
+REFUSED_STATUSES = frozenset({429})
+MAX_ATTEMPTS = 6
+BASE_DELAY, MAX_DELAY = 1.0, 32.0
+
+class _Quota:
+    """Sliding one-minute window of request start times."""
+    def __init__(self, per_minute: int):
+        self.per_minute = per_minute
+        self._sent: deque[float] = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._sent and now - self._sent[0] >= 60: self._sent.popleft()
+                if len(self._sent) < self.per_minute: self._sent.append(now); return
+                wait = 60 - (now - self._sent[0])
+            time.sleep(wait)
+
+_QUOTAS = {
+    ("sheets", False): _Quota(settings.sheets_reads_per_minute),
+    ("sheets", True): _Quota(settings.sheets_writes_per_minute),
+}
+_inflight: dict[tuple, Future] = {}
+_inflight_lock = threading.Lock()
+
+def _transient(e: Exception, retry_on) -> bool:
+    if isinstance(e, HttpError): return e.resp.status in retry_on
+    # A dropped connection may have been applied already, like a 5xx: retried only where 5xx are.
+    return any(status >= 500 for status in retry_on) and isinstance(e, (ssl.SSLError, ConnectionError, socket.timeout, TimeoutError))
+
+def _run(fn, api: str, write: bool, retry_on):
+    quota = _QUOTAS.get((api, write))
+    for attempt in range(MAX_ATTEMPTS):
+        if quota: quota.acquire()
+        try: return fn()
+        except Exception as e:
+            if attempt == MAX_ATTEMPTS - 1 or not _transient(e, retry_on): raise
+            time.sleep(random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** attempt)))
+
+def call(fn, api: str = "sheets", write: bool = False, retry_on=RETRY_STATUSES, key=None):
+    """Run `fn()` under `api`'s quota with retries. Reads with the same `key` already in flight share that call's result."""
+    if key is None or write: return _run(fn, api, write, retry_on)
+    with _inflight_lock:
+        future = _inflight.get(key); owner = future is None
+        if owner: future = _inflight[key] = Future()
+    if not owner: return future.result()
+    try:
+        result = _run(fn, api, write, retry_on)
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        future.set_exception(e); raise
+    finally:
+        with _inflight_lock: _inflight.pop(key, None)
+
+def execute(request, api: str = "sheets", write: bool | None = None, retry_on=RETRY_STATUSES):
+    """Execute a googleapiclient HttpRequest through the scheduler; GETs are treated as coalescable reads."""
+    if write is None: write = request.method != "GET"
+    return call(request.execute, api=api, write=write, retry_on=retry_on, key=None if write else (request.method, request.uri))
@@ -0,0 +1,175 @@
+from __future__ import annotations
+import bisect, math, threading, time
+from . import scheduler
+from .load_row import LoadRow, decode_rows
+from .auth import spreadsheet_service as sh
+from ..config import settings
+
+# In-process, columnar copy of the driver tabs (A..AA).
+# Reads are served from memory; after `ttl` seconds only the tail of the tab
+# is re-read (rows appended or touched recently), and after `full_ttl` the
+# whole tab is reloaded so edits made by hand further up are picked up too.
+WIDTH = 27
+CHUNK_ROWS = 500
+TAIL_ROWS = 100
+
+def col_index(letter: str) -> int:
+    """0-based column index for an A1 column letter ('A' -> 0, 'AA' -> 26)."""
+    idx = 0
+    for ch in letter.upper(): idx = idx * 26 + (ord(ch) - 64)
+    return idx - 1
+
+class _Tab:
+    __slots__ = ("columns", "rows", "loads", "filled", "refreshed_at", "loaded_at", "lock")
+    def __init__(self):
+        self.columns: list[list[str]] = [[] for _ in range(WIDTH)]
+        self.loads: dict[int, LoadRow] = {}
+        self.filled: dict[int, list[int]] = {}  # column -> sorted numbers of non-empty rows
+        self.rows = 0
+        self.refreshed_at = -math.inf  # never: the first access always loads the tab
+        self.loaded_at = -math.inf
+        self.lock = threading.Lock()
+
+class SheetMirror:
+    def __init__(self, ttl: float, full_ttl: float):
+        self.ttl, self.full_ttl = ttl, full_ttl
+        self._tabs: dict[str, _Tab] = {}
+        self._lock = threading.Lock()
+
+    def _tab(self, driver: str) -> _Tab:
+        with self._lock:
+            return self._tabs.setdefault(driver, _Tab())
+
+    def _fetch(self, driver: str, start: int) -> list[list[str]]:
+        # Sheets trims trailing empty rows from each range, so a short chunk only means
+        # its last rows are blank: pad it back to CHUNK_ROWS and stop at the first empty chunk.
+        rows = []
+        while True:
+            end = start + CHUNK_ROWS - 1
+            chunk = scheduler.execute(sh.spreadsheets().values().get(spreadsheetId=settings.spreadsheet_id, range=f"{driver}!A{start}:AA{end}")).get('values', [])
+            if not chunk: break
+            rows.extend(chunk); rows.extend([] for _ in range(CHUNK_ROWS - len(chunk)))
+            start = end + 1
+        while rows and not rows[-1]: rows.pop()
+        return rows
+
+    def _store(self, tab: _Tab, start: int, rows: list[list[str]]):
+        keep = start - 1
+        for n in [n for n in tab.loads if n > keep]: del tab.loads[n]
+        for c, column in enumerate(tab.columns):
+            del column[keep:]
+            column.extend(row[c] if c < len(row) else "" for row in rows)
+            if (filled := tab.filled.get(c)) is not None:
+                del filled[bisect.bisect_right(filled, keep):]
+                filled.extend(n for n in range(start, keep + len(rows) + 1) if column[n - 1])
+        tab.rows = keep + len(rows)
+
+    def _fresh(self, driver: str) -> _Tab:
+        tab = self._tab(driver)
+        with tab.lock:
+            now = time.monotonic()
+            if now - tab.loaded_at >= self.full_ttl:
+                self._store(tab, 1, self._fetch(driver, 1))
+                tab.loaded_at = tab.refreshed_at = now
+            elif now - tab.refreshed_at >= self.ttl:
+                start = max(1, tab.rows - TAIL_ROWS + 1)
+                self._store(tab, start, self._fetch(driver, start))
+                tab.refreshed_at = now
+        return tab
+
+    def is_fresh(self, driver: str) -> bool:
+        tab = self._tabs.get(driver)
+        return tab is not None and time.monotonic() - tab.refreshed_at < self.ttl
+
+    @staticmethod
+    def _row(tab: _Tab, n: int) -> list[str]:
+        if n < 1 or n > tab.rows: return []
+        values = [column[n - 1] for column in tab.columns]
+        while values and not values[-1]: values.pop()
+        return values
+
+    # --- reads ---
+    def row(self, driver: str, n: int) -> list[str]:
+        """Row `n` (1-based) with trailing empty cells trimmed, like the Sheets API returns it."""
+        tab = self._fresh(driver)
+        with tab.lock: return self._row(tab, n)
+
+    def rows(self, driver: str, start: int, end: int | None = None) -> list[list[str]]:
+        tab = self._fresh(driver)
+        with tab.lock:
+            end = tab.rows if end is None else min(end, tab.rows)
+            return [self._row(tab, n) for n in range(start, end + 1)]
+
+    def load_rows(self, driver: str, start: int, end: int | None = None) -> list[LoadRow]:
+        """Rows `start`..`end` decoded as LoadRows; each row is decoded once until it changes."""
+        tab = self._fresh(driver)
+        with tab.lock:
+            end = tab.rows if end is None else min(end, tab.rows)
+            missing = [n for n in range(start, end + 1) if n not in tab.loads]
+            if missing:
+                for load in decode_rows([self._row(tab, n) for n in range(missing[0], missing[-1] + 1)], missing[0]):
+                    tab.loads.setdefault(load.row, load)
+            return [tab.loads[n] for n in range(start, end + 1)]
+
+    def load_row(self, driver: str, n: int) -> LoadRow | None:
+        loads = self.load_rows(driver, n, n)
+        return loads[0] if loads else None
+
+    def cell(self, driver: str, n: int, letter: str) -> str:
+        tab = self._fresh(driver)
+        with tab.lock: return tab.columns[col_index(letter)][n - 1] if 1 <= n <= tab.rows else ""
+
+    def column(self, driver: str, letter: str, start: int = 1, end: int | None = None) -> list[str]:
+        tab = self._fresh(driver)
+        with tab.lock: return tab.columns[col_index(letter)][start - 1:end]
+
+    def last_row(self, driver: str, letter: str = "A") -> int:
+        """Number of the last non-empty row in a column (what `len(values)` of `X:X` gives)."""
+        tab = self._fresh(driver)
+        with tab.lock:
+            column = tab.columns[col_index(letter)]
+            for n in range(len(column), 0, -1):
+                if column[n - 1]: return n
+            return 0
+
+    def run_end(self, driver: str, letter: str, start: int) -> int:
+        """Last row of the unbroken block of non-empty cells starting at `start` (start - 1 if `start` is empty)."""
+        tab = self._fresh(driver); c = col_index(letter)
+        with tab.lock:
+            column, n = tab.columns[c], start
+            while n <= tab.rows and column[n - 1]: n += 1
+            return n - 1
+
+    def prev_filled(self, driver: str, letter: str, n: int) -> int:
+        """Number of the last non-empty row at or above `n` in a column (0 if none), via a per-column row index."""
+        tab = self._fresh(driver); c = col_index(letter)
+        with tab.lock:
+            filled = tab.filled.get(c)
+            if filled is None: filled = tab.filled[c] = [i for i, v in enumerate(tab.columns[c], 1) if v]
+            i = bisect.bisect_right(filled, n)
+            return filled[i - 1] if i else 0
+
+    # --- writes made by this process ---
+    def set_cell(self, driver: str, n: int, letter: str, value):
+        tab = self._tabs.get(driver)
+        if tab is None: return
+        if isinstance(value, str) and value.startswith("="):
+            self.invalidate(driver); return
+        with tab.lock:
+            if n > tab.rows:
+                for column in tab.columns: column.extend([""] * (n - tab.rows))
+                tab.rows = n
+            c = col_index(letter); value = "" if value is None else str(value)
+            tab.columns[c][n - 1] = value
+            tab.loads.pop(n, None)
+            if (filled := tab.filled.get(c)) is not None:
+                i = bisect.bisect_left(filled, n); present = i < len(filled) and filled[i] == n
+                if value and not present: filled.insert(i, n)
+                elif not value and present: del filled[i]
+
+    def invalidate(self, driver: str | None = None):
+        with self._lock:
+            if driver is None: self._tabs.clear()
+            else: self._tabs.pop(driver, None)
+
+mirror = SheetMirror(ttl=settings.sheet_mirror_ttl, full_ttl=settings.sheet_mirror_full_ttl)
@@ -1,23 +1,25 @@
 from __future__ import print_function
+import hashlib
+import io
 import os
-import shutil
+import re
 from datetime import datetime
-import io
-import time
-import ssl
+from decimal import Decimal
 from fpdf import FPDF
-from googleapiclient.http import MediaIoBaseDownload, MediaFileUpload
 from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaFileUpload, MediaIoBaseUpload
 from .auth import spreadsheet_service as sh, drive_service as dr
+from .sheet_mirror import mirror, col_index
+from . import blob_cache, invoice_template, row_cursor, scheduler, upload_index
+from .load_row import STATEMENT_AMOUNTS, LoadRow, decode_rows
 from ..config import settings
 
 SHEET_ID = settings.spreadsheet_id
 
 # --- CORE HELPER FUNCTIONS ---
 def get_current_cell(driver_name: str, column: str = "A") -> int:
-    range_name = f"{driver_name}!{column}:{column}"
-    result = sh.spreadsheets().values().get(spreadsheetId=SHEET_ID, range=range_name).execute()
-    return len(result.get("values", []))
+    if mirror.is_fresh(driver_name): return mirror.last_row(driver_name, column)
+    return row_cursor.last_row(driver_name, column)
 
 def get_id_from_link(link):
     if not link: return None
@@ -28,61 +30,176 @@ def get_id_from_link(link):
     except (ValueError, TypeError): return None
 
 def open_invoice_load(driver, cell):
-    range_name = f'{driver}!A{cell}:AA{cell}'
-    return sh.spreadsheets().values().get(spreadsheetId=SHEET_ID, range=range_name).execute().get('values')
+    row = mirror.row(driver, cell)
+    return [row] if row else None
+
+def open_load(driver, cell) -> LoadRow | None:
+    load = mirror.load_row(driver, cell)
+    return load if load and any(mirror.row(driver, cell)) else None
 
 def update_cell(driver, cell, letter, value):
     rangeName = f"{driver}!{letter}{cell}"; body = {'values': [[value]]}
-    sh.spreadsheets().values().update(spreadsheetId=SHEET_ID, range=rangeName, valueInputOption='USER_ENTERED', body=body).execute()
+    scheduler.execute(sh.spreadsheets().values().update(spreadsheetId=SHEET_ID, range=rangeName, valueInputOption='USER_ENTERED', body=body))
+    _record_write(driver, cell, letter, value)
+
+def append_row(driver, values: dict) -> int:
+    """Append one row ({column letter: value}) below the tab's data and return its row number.
+
+    Sheets picks the row server-side, so concurrent appends to the same tab
+    never land on the same row. Columns missing from `values` are left untouched.
+    """
+    row = [None] * (max(col_index(letter) for letter in values) + 1)
+    for letter, value in values.items(): row[col_index(letter)] = value
+    # Only 429s are retried: a 5xx may still have appended the row.
+    result = scheduler.execute(sh.spreadsheets().values().append(spreadsheetId=SHEET_ID, range=f"{driver}!A:A", valueInputOption='USER_ENTERED', insertDataOption='OVERWRITE', body={'values': [row]}), retry_on=scheduler.REFUSED_STATUSES)
+    cell = int(re.search(r"![A-Z]+(\d+)", result["updates"]["updatedRange"]).group(1))
+    for letter, value in values.items():
+        if value is not None: _record_write(driver, cell, letter, value)
+    return cell
+
+def _record_write(driver, cell, letter, value):
+    # Keep the local views of the tab in step with what we just wrote.
+    mirror.set_cell(driver, cell, letter, value)
+    row_cursor.advance(driver, cell, letter, value)
+
+_sheet_id_cache = {}
+
+def get_sheet_id(tab_name):
+    if tab_name not in _sheet_id_cache:
+        meta = scheduler.execute(sh.spreadsheets().get(spreadsheetId=SHEET_ID, fields="sheets(properties(sheetId,title))"))
+        for s in meta["sheets"]: _sheet_id_cache[s["properties"]["title"]] = s["properties"]["sheetId"]
+    return _sheet_id_cache.get(tab_name)
+
+class SheetBatch:
+    """Write buffer for one driver tab.
+
+    Cell values and formatting requests are collected and sent on flush as a
+    single values.batchUpdate plus a single spreadsheets.batchUpdate, instead
+    of one round trip per cell. Used as a context manager it flushes on a
+    clean exit and drops the buffer if the block raised.
+    """
+    def __init__(self, driver: str):
+        self.driver = driver
+        self._values: dict[tuple[int, str], object] = {}
+        self._requests: list[dict] = []
+
+    def __enter__(self): return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None: self.flush()
+        return False
+
+    def set(self, cell, letter, value):
+        if value is not None: self._values[(cell, letter)] = value
+
+    def fill(self, cell, rgb: tuple, start: str = "A", end: str = "AA"):
+        red, green, blue = rgb
+        self._requests.append({"repeatCell": {
+            "range": {"sheetId": get_sheet_id(self.driver), "startRowIndex": cell - 1, "endRowIndex": cell, "startColumnIndex": col_index(start), "endColumnIndex": col_index(end) + 1},
+            "cell": {"userEnteredFormat": {"backgroundColor": {"red": red, "green": green, "blue": blue}}},
+            "fields": "userEnteredFormat.backgroundColor"}})
+
+    def flush(self):
+        if self._values:
+            data = [{"range": f"{self.driver}!{letter}{cell}", "values": [[v]]} for (cell, letter), v in self._values.items()]
+            scheduler.execute(sh.spreadsheets().values().batchUpdate(spreadsheetId=SHEET_ID, body={"valueInputOption": "USER_ENTERED", "data": data}))
+            for (cell, letter), v in self._values.items(): _record_write(self.driver, cell, letter, v)
+        if self._requests:
+            scheduler.execute(sh.spreadsheets().batchUpdate(spreadsheetId=SHEET_ID, body={"requests": self._requests}))
+        self._values, self._requests = {}, []
 
 def download_file(file_id, name):
-    if not file_id: raise ValueError("File ID missing")
-    attempts, max_attempts, wait_time = 0, 4, 5
-    while attempts < max_attempts:
-        try:
-            request = dr.files().get_media(fileId=file_id)
-            fh = io.BytesIO()
-            downloader = MediaIoBaseDownload(fh, request)
-            done = False
-            while not done: status, done = downloader.next_chunk()
-            fh.seek(0)
-            os.makedirs("./files_cash", exist_ok=True)
-            with open(f'./files_cash/{name}', 'wb') as f: shutil.copyfileobj(fh, f)
-            return
-        except HttpError as error:
-            if error.resp.status == 404 and attempts < max_attempts - 1:
-                attempts += 1; time.sleep(wait_time)
-            else: raise error
+    blob_cache.copy_to(file_id, f'./files_cash/{name}')
+
+RESUMABLE_THRESHOLD = 5 * 1024 * 1024
+_ANYONE_READER = {'type': 'anyone', 'role': 'reader'}
+
+# An upload source is a local path or an in-memory (file name, PDF bytes) pair.
+def _name(src) -> str:
+    return os.path.basename(src) if isinstance(src, str) else src[0]
+
+def _md5(src) -> str:
+    return upload_index.file_md5(src) if isinstance(src, str) else hashlib.md5(src[1]).hexdigest()
+
+def _media(src):
+    # Large PDFs go up in resumable chunks so a dropped connection does not restart the whole file.
+    if isinstance(src, str):
+        return MediaFileUpload(src, mimetype='application/pdf', resumable=os.path.getsize(src) > RESUMABLE_THRESHOLD, chunksize=RESUMABLE_THRESHOLD)
+    return MediaIoBaseUpload(io.BytesIO(src[1]), mimetype='application/pdf', resumable=len(src[1]) > RESUMABLE_THRESHOLD, chunksize=RESUMABLE_THRESHOLD)
+
+def _create(src) -> dict:
+    file_metadata = {'name': _name(src), 'parents': [settings.drive_folder_id]}
+    # Not idempotent: a create that timed out may still have made the file, so only a 429 is retried.
+    return scheduler.execute(dr.files().create(body=file_metadata, media_body=_media(src), fields='id, webViewLink'), api="drive", retry_on=scheduler.REFUSED_STATUSES)
+
+def _existing(file_id: str, md5: str) -> dict | None:
+    try: meta = scheduler.execute(dr.files().get(fileId=file_id, fields='id, webViewLink, md5Checksum, trashed'), api="drive")
+    except HttpError as e:
+        if e.resp.status == 404: return None
+        raise
+    return meta if meta.get('md5Checksum') == md5 and not meta.get('trashed') else None
+
+def _replace(file_id: str, src) -> dict | None:
+    try: return scheduler.execute(dr.files().update(fileId=file_id, body={'name': _name(src)}, media_body=_media(src), fields='id, webViewLink'), api="drive")
+    except HttpError as e:
+        if e.resp.status == 404: return None
+        raise
+
+def _place(src, slot: str | None) -> tuple[dict, bool]:
+    """Put a PDF on Drive for a sheet slot; returns (file, created).
+
+    Identical bytes reuse the file we already uploaded; a changed PDF for a slot
+    overwrites that slot's file in place (same id, same link, same sharing).
+    """
+    md5 = _md5(src); file = created = None
+    if hit := upload_index.by_hash(md5):
+        if not (file := _existing(hit[0], md5)): upload_index.forget(hit[0])
+    if not file and slot and (prev := upload_index.by_slot(slot)) and upload_index.slots_using(prev[0]) == 1:
+        if not (file := _replace(prev[0], src)): upload_index.forget(prev[0])
+    if not file: file = _create(src); created = True
+    if slot: upload_index.record(slot, file['id'], file.get('webViewLink'), md5)
+    return file, bool(created)
+
+def _share(file_ids: list[str]):
+    # Files in a pre-shared folder inherit "anyone with the link"; otherwise one HTTP batch covers them all.
+    if settings.drive_folder_shared or not file_ids: return
+    failed = []
+    def _done(request_id, response, exception):
+        if exception is not None: failed.append(request_id)
+    batch = dr.new_batch_http_request(callback=_done)
+    for file_id in file_ids: batch.add(dr.permissions().create(fileId=file_id, body=_ANYONE_READER, fields='id'), request_id=file_id)
+    scheduler.call(batch.execute, api="drive", write=True)
+    for file_id in failed: scheduler.execute(dr.permissions().create(fileId=file_id, body=_ANYONE_READER, fields='id'), api="drive")
+
+def _perform_uploads(sources: list, slots: list[str | None] | None = None) -> list[dict]:
+    placed = [_place(src, slot) for src, slot in zip(sources, slots or [None] * len(sources))]
+    _share([f['id'] for f, created in placed if created])
+    return [f for f, _ in placed]
 
 def _perform_upload(local_path: str):
-    attempts, max_attempts, wait_time = 0, 3, 5
-    while attempts < max_attempts:
-        try:
-            file_metadata = {'name': os.path.basename(local_path), 'parents': [settings.drive_folder_id]}
-            media = MediaFileUpload(local_path, mimetype='application/pdf')
-            file = dr.files().create(body=file_metadata, media_body=media, fields='id, webViewLink').execute()
-            dr.permissions().create(fileId=file.get('id'), body={'type': 'anyone', 'role': 'reader'}).execute()
-            return file
-        except ssl.SSLEOFError as e:
-            attempts += 1
-            if attempts >= max_attempts: raise e
-            time.sleep(wait_time)
-        except Exception as e: raise e
-
-def upload_pod(local_path: str, driver: str, cell: int):
-    file = _perform_upload(local_path)
-    update_cell(driver, cell, 'N', file.get('webViewLink'))
-
-def upload_file(file_name, driver_name, cell, column: str):
-    file = _perform_upload(file_name)
-    update_cell(driver_name, cell, column, file.get('webViewLink'))
+    return _perform_uploads([local_path])[0]
+
+def upload_pod(local_path: str, driver: str, cell: int, batch: SheetBatch | None = None) -> str:
+    return upload_file(local_path, driver, cell, 'N', batch=batch)
+
+def upload_file(file_name, driver_name, cell, column: str, batch: SheetBatch | None = None) -> str:
+    return upload_files(driver_name, [(file_name, cell, column)], batch)[0]
+
+def upload_files(driver_name, items: list[tuple], batch: SheetBatch | None = None) -> list[str]:
+    """Upload (source, row, column) items together, share them in one round trip and write each link to its cell.
+
+    A source is a local path or a (file name, bytes) pair for PDFs rendered in memory.
+    """
+    slots = [f"{driver_name}!{column}{cell}" for _, cell, column in items]
+    links = [f.get('webViewLink') for f in _perform_uploads([src for src, _, _ in items], slots)]
+    own = batch is None
+    if own: batch = SheetBatch(driver_name)
+    for (_, cell, column), link in zip(items, links): batch.set(cell, column, link)
+    if own: batch.flush()
+    return links
 
 def open_prev_insurance(driver, cell):
-    range_name = f'{driver}!Y1:Y{cell}'
-    result = sh.spreadsheets().values().get(spreadsheetId=SHEET_ID, range=range_name).execute()
-    if result.get('values'):
-        for row in reversed(result.get('values')):
-            if row and row[0]: return row
+    if row := mirror.prev_filled(driver, 'Y', cell): return [mirror.cell(driver, row, 'Y')]
     raise RuntimeError(f"Could not find previous insurance date for {driver}")
 
 def get_start_finish_for_ifta(quarter: int, driver: str) -> list:
@@ -97,99 +214,75 @@ def get_start_finish_for_ifta(quarter: int, driver: str) -> list:
     end_date = datetime.strptime(end_date, "%m/%d/%Y")
     
     last_row = get_current_cell(driver)
-    ranges = [f"{driver}!C2:C{last_row}", f"{driver}!E2:E{last_row}", f"{driver}!F2:F{last_row}"]
-    result = sh.spreadsheets().values().batchGet(spreadsheetId=SHEET_ID, ranges=ranges).execute()
-    
-    dates = result['valueRanges'][0].get('values', [])
-    pus = result['valueRanges'][1].get('values', [])
-    dels = result['valueRanges'][2].get('values', [])
+    loads = mirror.load_rows(driver, 2, last_row)
 
     trip_segments = []
-    for i in range(len(dates)):
-        try:
-            date_str = dates[i][0]; pu_str = pus[i][0]; del_str = dels[i][0]
-            date_obj = datetime.strptime(date_str, "%m/%d/%Y")
-            if start_date < date_obj < end_date:
-                pu_list = [p.strip() for p in pu_str.split(';')]
-                del_list = [d.strip() for d in del_str.split(';')]
-                for j in range(len(pu_list) - 1): trip_segments.append((pu_list[j], pu_list[j+1]))
-                trip_segments.append((pu_list[-1], del_list[0]))
-                for j in range(len(del_list) - 1): trip_segments.append((del_list[j], del_list[j+1]))
-                if (i + 1) < len(pus) and pus[i+1]:
-                    next_pu = pus[i+1][0].split(';')[0].strip()
-                    trip_segments.append((del_list[-1], next_pu))
-        except (ValueError, IndexError):
-            continue
+    for i, load in enumerate(loads):
+        if not (load.del_date and load.pu_location and load.del_location): continue
+        if start_date.date() < load.del_date < end_date.date():
+            pu_list = [p.strip() for p in load.pu_location.split(';')]
+            del_list = [d.strip() for d in load.del_location.split(';')]
+            for j in range(len(pu_list) - 1): trip_segments.append((pu_list[j], pu_list[j+1]))
+            trip_segments.append((pu_list[-1], del_list[0]))
+            for j in range(len(del_list) - 1): trip_segments.append((del_list[j], del_list[j+1]))
+            if (i + 1) < len(loads) and loads[i+1].pu_location:
+                next_pu = loads[i+1].pu_location.split(';')[0].strip()
+                trip_segments.append((del_list[-1], next_pu))
     return trip_segments
 
 # --- PDF GENERATION FUNCTIONS ---
 def compilate_invoice_page(loadnum, driver, cell, broker, pu, pudate, deliv, deldate, innum, gross, lumper_kolobok, lumper_broker):
-    pdf = FPDF('P', 'mm', 'A4'); pdf.add_page()
-    header_text = ('Kolobok Inc.\n9063 Caloosa Rd\nFort Myers, FL 33967\n239-293-1919 or 312-535-3912\nchrisribas89@gmail.com')
-    pdf.set_font('times', '', 12); pdf.multi_cell(0, 5, header_text, align='L')
-    pdf.set_font('helvetica', 'B', 16); pdf.set_text_color(25, 126, 134); pdf.cell(0, 10, 'INVOICE', ln=True, align='L')
-    pdf.set_font('helvetica', 'B', 12); pdf.set_text_color(0, 0, 0); pdf.cell(50, 5, 'BILL TO', ln=0); pdf.cell(0, 5, f'INVOICE # {innum}', ln=1, align='R')
-    try:
-        with open(f'./customers/{broker}.txt') as file: brokers_adress = file.read()
-        pdf.set_font('times', '', 12); pdf.multi_cell(0, 5, brokers_adress, align='L')
-    except FileNotFoundError: pdf.set_font('times', 'I', 12); pdf.multi_cell(0, 5, f"{broker}\n(Address file not found)", align='L')
-    pdf.set_font('helvetica', 'B', 12); pdf.cell(160, 5, 'DATE', ln=0, align='R'); pdf.set_font('helvetica', '', 12); pdf.cell(30, 5, datetime.now().strftime("%m-%d-%Y"), ln=1, align='R')
-    pdf.cell(32, 30, 'TRK#/DRIVER', ln=0); pdf.cell(63, 30, driver, ln=0); pdf.cell(35, 30, 'LOAD/ORDER #', ln=0); pdf.cell(60, 30, loadnum, ln=1)
-    pdf.cell(0, 8, 'LOAD DESCRIPTION', ln=1, border=1, align='C')
-    pdf.set_font('helvetica', '', 10); pdf.set_text_color(25, 126, 134); pdf.cell(10, 8, 'SO', border=1); pdf.cell(160, 8, 'ADDRESS', border=1); pdf.cell(20, 8, 'DATE', ln=1, border=1)
-    pdf.set_text_color(0, 0, 0); pdf.cell(10, 10, 'PU', border=1); pdf.cell(160, 10, pu, border=1); pdf.cell(20, 10, pudate, ln=1, border=1); pdf.cell(10, 10, 'DEL', border=1); pdf.cell(160, 10, deliv, border=1); pdf.cell(20, 10, deldate, ln=1, border=1)
-    final_gross = float(gross) if gross else 0.0; lumper_text = '<none>'
-    if lumper_kolobok: lumper_text = f'(Kolobok Inc paid) ${lumper_kolobok}'; final_gross += float(lumper_kolobok)
-    elif lumper_broker: lumper_text = f'(Broker paid) ${lumper_broker}'
-    pdf.set_text_color(25, 126, 134); pdf.cell(95, 8, 'LUMPER', border=1); pdf.set_text_color(0, 0, 0); pdf.cell(95, 8, lumper_text, ln=1, border=1, align='R')
-    pdf.set_text_color(25, 126, 134); pdf.cell(95, 8, 'BALANCE DUE', border=1); pdf.set_font('helvetica', 'B', 12); pdf.set_text_color(0, 0, 0); pdf.cell(95, 8, f'${final_gross:,.2f}', ln=1, border=1, align='R')
-    pdf.set_text_color(25, 126, 134); pdf.set_font('helvetica', '', 10); pdf.cell(0, 15, 'PAYMENT INFO:', ln=1, border=1, align='C')
-    pdf.cell(95, 8, 'Type of account:', border=1); pdf.set_text_color(0,0,0); pdf.set_font('helvetica', 'B', 10); pdf.cell(95, 8, 'Checking', ln=1, border=1)
-    pdf.set_text_color(25, 126, 134); pdf.set_font('helvetica', '', 10); pdf.cell(95, 8, 'Name as it appears on Bank Account:', border=1); pdf.set_text_color(0,0,0); pdf.set_font('helvetica', 'B', 10); pdf.cell(95, 8, settings.company_payee_name or 'N/A', ln=1, border=1)
-    pdf.set_text_color(25, 126, 134); pdf.set_font('helvetica', '', 10); pdf.cell(95, 8, 'Bank Name:', border=1); pdf.set_text_color(0,0,0); pdf.set_font('helvetica', 'B', 10); pdf.cell(95, 8, settings.company_bank_name or 'N/A', ln=1, border=1)
-    pdf.set_text_color(25, 126, 134); pdf.set_font('helvetica', '', 10); pdf.cell(95, 8, 'Financial institution phone number:', border=1); pdf.set_text_color(0,0,0); pdf.set_font('helvetica', 'B', 10); pdf.cell(95, 8, settings.company_bank_phone or 'N/A', ln=1, border=1)
-    pdf.set_text_color(25, 126, 134); pdf.set_font('helvetica', '', 10); pdf.cell(95, 8, 'Banking Routing / Transfer Number (9 digits):', border=1); pdf.set_text_color(0,0,0); pdf.set_font('helvetica', 'B', 10); pdf.cell(95, 8, settings.company_routing_number or 'N/A', ln=1, border=1)
-    pdf.set_text_color(25, 126, 134); pdf.set_font('helvetica', '', 10); pdf.cell(95, 8, 'Bank Account Number:', border=1); pdf.set_text_color(0,0,0); pdf.set_font('helvetica', 'B', 10); pdf.cell(95, 8, settings.company_account_number or 'N/A', ln=1, border=1)
-    pdf.set_font('helvetica', '', 10); pdf.cell(0, 15, 'PLEASE USE THIS MAIL ADDRESS FOR CHECKS:', ln=1, align='C')
-    pdf.set_font('helvetica', 'B', 10); pdf.set_text_color(0, 0, 0); pdf.cell(0, 8, '9063 Caloosa Rd', ln=1, align='C'); pdf.cell(0, 8, 'Fort Myers, FL 33967', ln=1, align='C')
-    pdf.set_font('helvetica', '', 8); pdf.cell(0, 10, 'Thank you!', ln=1, align='C')
-    os.makedirs("./files_cash", exist_ok=True); pdf.output(f'./files_cash/Invoice_{loadnum}_MC_1294648.pdf')
+    return invoice_template.render(innum, driver, loadnum, broker, pu, pudate, deliv, deldate, gross, lumper_kolobok, lumper_broker)
+
+def _statement_loads(driver, start_row) -> list[LoadRow]:
+    # The pay period runs from start_row to the row above the first empty column A.
+    # That end is found first (mirror index when warm, else a probe of column A
+    # alone), so only the period's rows are read as A..AA.
+    if mirror.is_fresh(driver):
+        end = mirror.run_end(driver, "A", start_row)
+        window = mirror.load_rows(driver, start_row, end) if end >= start_row else []
+    else:
+        last = get_current_cell(driver)
+        if last < start_row: return []
+        column = scheduler.execute(sh.spreadsheets().values().get(spreadsheetId=SHEET_ID, range=f"{driver}!A{start_row}:A{last}")).get('values', [])
+        end = start_row + next((i for i, v in enumerate(column) if not (v and v[0])), len(column)) - 1
+        if end < start_row: return []
+        values = scheduler.execute(sh.spreadsheets().values().get(spreadsheetId=SHEET_ID, range=f"{driver}!A{start_row}:AA{end}")).get('values', [])
+        window = decode_rows(values, start_row)
+    loads = []
+    for load in window:
+        if not load.pu_date_text: break
+        load.check_amounts(driver, STATEMENT_AMOUNTS); loads.append(load)
+    return loads
+
+def _deductions(loads: list[LoadRow]) -> list[dict]:
+    return [{'label': load.deduction_label or "Deduction", 'amount': load.deduction} for load in loads if load.deduction is not None]
+
+def _draw_loads_table(pdf, loads: list[LoadRow]):
+    pdf.set_font('helvetica', 'B', 8)
+    pdf.cell(15, 5, 'PU date', ln=0, border=1); pdf.cell(15, 5, 'Del date', ln=0, border=1); pdf.cell(30, 5, 'From:', ln=0, border=1); pdf.cell(30, 5, 'To:', ln=0, border=1); pdf.cell(30, 5, 'Broker', ln=0, border=1); pdf.cell(15, 5, 'Gross', ln=0, border=1); pdf.cell(10, 5, 'Miles', ln=0, border=1); pdf.cell(17, 5, 'Kolobok %', ln=0, border=1); pdf.cell(15, 5, 'Gross - %', ln=1, border=1)
+    total_gross = total_miles = total_commission = total_loads = Decimal("0")
+    for load in loads:
+        pdf.set_font('helvetica', '', 7)
+        pdf.cell(15, 5, load.pu_date_text[:11], ln=0, border=1); pdf.cell(15, 5, load.del_date_text[:11], ln=0, border=1); pdf.cell(30, 5, load.pu_location[:19], ln=0, border=1); pdf.cell(30, 5, load.del_location[:19], ln=0, border=1); pdf.cell(30, 5, load.broker[:19], ln=0, border=1); pdf.cell(15, 5, f"{load.gross:.2f}"[:9], ln=0, border=1); pdf.cell(10, 5, f"{load.miles:.0f}"[:9], ln=0, border=1); pdf.cell(17, 5, f"{load.commission_amount:.2f}"[:9], ln=0, border=1); pdf.cell(15, 5, f"{load.net:.2f}"[:9], ln=1, border=1)
+        total_gross += load.gross; total_miles += load.miles; total_commission += load.commission_amount; total_loads += load.net
+    pdf.set_font('helvetica', 'B', 8)
+    pdf.cell(15, 5, '', border=1); pdf.cell(15, 5, '', border=1); pdf.cell(30, 5, '', border=1); pdf.cell(30, 5, '', border=1); pdf.cell(30, 5, 'Totals:', align='R', border=1)
+    pdf.cell(15, 5, f"{total_gross:.2f}"[:9], border=1); pdf.cell(10, 5, f"{total_miles:.0f}"[:9], border=1); pdf.cell(17, 5, f"{total_commission:.2f}"[:9], border=1); pdf.cell(15, 5, f"{total_loads:.2f}"[:9], ln=1, border=1)
+    return total_loads
 
 def compilate_salary_company_driver(driver, start_row, start_date_ignored, end_date_ignored):
     pdf = FPDF('P', 'mm', 'A4'); pdf.add_page()
-    read_range = f"{driver}!A{start_row}:AA"
-    all_rows = sh.spreadsheets().values().get(spreadsheetId=SHEET_ID, range=read_range).execute().get('values', [])
-    loads_data, end_date = [], ""
-    start_date = all_rows[0][0] if all_rows and all_rows[0] else ""
-    for row in all_rows:
-        if not row or not row[0]: break
-        loads_data.append(row)
-        if len(row) > 2 and row[2]: end_date = row[2]
-    if not end_date: end_date = start_date
+    loads = _statement_loads(driver, start_row)
+    start_date = loads[0].pu_date_text if loads else ""
+    end_date = next((load.del_date_text for load in reversed(loads) if load.del_date_text), "") or start_date
     pdf.set_font('helvetica', 'B', 18)
     pdf.cell(190, 10, 'Kolobok INC', ln=1)
     pdf.cell(190, 10, f'Pay to: {settings.get_pay_to_name(driver)}', ln=1)
     pdf.cell(190, 10, f'Statement {start_date} - {end_date}', ln=1)
     pdf.set_font('helvetica', 'B', 14); pdf.cell(15, 15, 'Loads Complete:', ln=1)
-    pdf.set_font('helvetica', 'B', 8)
-    pdf.cell(15, 5, 'PU date', ln=0, border=1); pdf.cell(15, 5, 'Del date', ln=0, border=1); pdf.cell(30, 5, 'From:', ln=0, border=1); pdf.cell(30, 5, 'To:', ln=0, border=1); pdf.cell(30, 5, 'Broker', ln=0, border=1); pdf.cell(15, 5, 'Gross', ln=0, border=1); pdf.cell(10, 5, 'Miles', ln=0, border=1); pdf.cell(17, 5, 'Kolobok %', ln=0, border=1); pdf.cell(15, 5, 'Gross - %', ln=1, border=1)
-    total_gross = total_miles = total_commission = total_loads = 0
-    extra_charges = []
-    for values in loads_data:
-        gross = float(values[9]) if len(values) > 9 and values[9] else 0.0
-        commision_rate = float(values[20]) / 100.0 if len(values) > 20 and values[20] else 0.0
-        miles = float(values[10]) if len(values) > 10 and values[10] else 0.0
-        w_gets = gross - (gross * commision_rate)
-        pdf.set_font('helvetica', '', 7)
-        pdf.cell(15, 5, (values[0] or '')[:11], ln=0, border=1); pdf.cell(15, 5, (values[2] or '')[:11], ln=0, border=1); pdf.cell(30, 5, (values[4] or '')[:19], ln=0, border=1); pdf.cell(30, 5, (values[5] or '')[:19], ln=0, border=1); pdf.cell(30, 5, (values[6] or '')[:19], ln=0, border=1); pdf.cell(15, 5, f"{gross:.2f}"[:9], ln=0, border=1); pdf.cell(10, 5, f"{miles:.0f}"[:9], ln=0, border=1); pdf.cell(17, 5, f"{gross * commision_rate:.2f}"[:9], ln=0, border=1); pdf.cell(15, 5, f"{w_gets:.2f}"[:9], ln=1, border=1)
-        total_gross += gross; total_miles += miles; total_commission += (gross * commision_rate); total_loads += w_gets
-        try:
-            if len(values) > 25 and values[25]:
-                extra_charges.append({'label': values[26] if len(values) > 26 and values[26] else "Deduction", 'amount': float(values[25])})
-        except (ValueError, IndexError): pass
-    pdf.set_font('helvetica', 'B', 8)
-    pdf.cell(15, 5, '', border=1); pdf.cell(15, 5, '', border=1); pdf.cell(30, 5, '', border=1); pdf.cell(30, 5, '', border=1); pdf.cell(30, 5, 'Totals:', align='R', border=1)
-    pdf.cell(15, 5, f"{total_gross:.2f}"[:9], border=1); pdf.cell(10, 5, f"{total_miles:.0f}"[:9], border=1); pdf.cell(17, 5, f"{total_commission:.2f}"[:9], border=1); pdf.cell(15, 5, f"{total_loads:.2f}"[:9], ln=1, border=1)
+    total_loads = _draw_loads_table(pdf, loads)
+    extra_charges = _deductions(loads)
     pdf.ln(5)
     pdf.set_font('helvetica', 'B', 14); pdf.set_fill_color(232, 253, 226)
     pdf.cell(177, 15, f'Total for loads: ${total_loads:,.2f}', ln=1, fill=True)
@@ -198,52 +291,29 @@ def compilate_salary_company_driver(driver, start_row, start_date_ignored, end_d
     for charge in reversed(extra_charges):
         amount = charge['amount']; final_pay_str += f" - ${amount:.2f}" if amount > 0 else f" + ${abs(amount):,.2f}"
         pdf.set_font('helvetica', '', 12); pdf.cell(177, 10, f"{charge['label']}: ${abs(amount):.2f}", ln=1)
-        line_width = min((abs(amount) / total_loads) * 177 if total_loads > 0 else 0, 177)
+        line_width = float(min((abs(amount) / total_loads) * 177 if total_loads > 0 else 0, 177))
         pdf.set_fill_color(252, 66, 37) if amount >= 0 else pdf.set_fill_color(85, 252, 37)
         pdf.cell(line_width, 0.5, '', ln=1, fill=True)
     settlement -= sum(c['amount'] for c in extra_charges)
     pdf.ln(5); pdf.set_font('helvetica', 'B', 14); pdf.cell(177, 15, final_pay_str, ln=1)
     pdf.set_fill_color(74, 245, 44); pdf.cell(177, 15, f'Settlement Total: ${settlement:,.2f}', ln=1, align='C', fill=True)
-    os.makedirs("./files_cash", exist_ok=True)
-    pdf.output('./files_cash/1st_page.pdf')
+    return bytes(pdf.output())
 
 def compilate_salary_page(driver, cell, fuel_start_date, fuel_end_date, totals, discount, insurance, insurance_d, trailer, trailer_d):
     pdf = FPDF('P', 'mm', 'A4'); pdf.add_page()
-    read_range = f"{driver}!A{cell}:AA"
-    all_rows = sh.spreadsheets().values().get(spreadsheetId=SHEET_ID, range=read_range).execute().get('values', [])
-    loads_data, extra_charges = [], []
-    for values in all_rows:
-        if not values or not values[0]: break
-        loads_data.append(values)
-        try:
-            if len(values) > 25 and values[25]:
-                extra_charges.append({'label': values[26] if len(values) > 26 and values[26] else "Deduction", 'amount': float(values[25])})
-        except (ValueError, IndexError): pass
-    
-    start_date = loads_data[0][0] if loads_data and loads_data[0] else fuel_start_date
-    end_date = loads_data[-1][2] if loads_data and len(loads_data[-1]) > 2 and loads_data[-1][2] else fuel_end_date
+    loads = _statement_loads(driver, cell)
+    extra_charges = _deductions(loads)
+    totals, discount = Decimal(str(totals)), Decimal(str(discount))
+
+    start_date = loads[0].pu_date_text if loads else fuel_start_date
+    end_date = loads[-1].del_date_text if loads and loads[-1].del_date_text else fuel_end_date
     
     pdf.set_font('helvetica', 'B', 18)
     pdf.cell(190, 10, 'Kolobok INC', ln=1)
     pdf.cell(190, 10, f'Pay to: {settings.get_pay_to_name(driver)}', ln=1)
     pdf.cell(190, 10, f'Statement {start_date} - {end_date}', ln=1)
     pdf.set_font('helvetica', 'B', 14); pdf.cell(15, 15, 'Loads Complete:', ln=1)
-    pdf.set_font('helvetica', 'B', 8)
-    pdf.cell(15, 5, 'PU date', ln=0, border=1); pdf.cell(15, 5, 'Del date', ln=0, border=1); pdf.cell(30, 5, 'From:', ln=0, border=1); pdf.cell(30, 5, 'To:', ln=0, border=1); pdf.cell(30, 5, 'Broker', ln=0, border=1); pdf.cell(15, 5, 'Gross', ln=0, border=1); pdf.cell(10, 5, 'Miles', ln=0, border=1); pdf.cell(17, 5, 'Kolobok %', ln=0, border=1); pdf.cell(15, 5, 'Gross - %', ln=1, border=1)
-    
-    total_gross = total_miles = total_commission = total_loads = 0
-    for values in loads_data:
-        gross = float(values[9]) if len(values) > 9 and values[9] else 0.0
-        commision_rate = float(values[20]) / 100.0 if len(values) > 20 and values[20] else 0.0
-        miles = float(values[10]) if len(values) > 10 and values[10] else 0.0
-        w_gets = gross - (gross * commision_rate)
-        pdf.set_font('helvetica', '', 7)
-        pdf.cell(15, 5, (values[0] or '')[:11], ln=0, border=1); pdf.cell(15, 5, (values[2] or '')[:11], ln=0, border=1); pdf.cell(30, 5, (values[4] or '')[:19], ln=0, border=1); pdf.cell(30, 5, (values[5] or '')[:19], ln=0, border=1); pdf.cell(30, 5, (values[6] or '')[:19], ln=0, border=1); pdf.cell(15, 5, f"{gross:.2f}"[:9], ln=0, border=1); pdf.cell(10, 5, f"{miles:.0f}"[:9], ln=0, border=1); pdf.cell(17, 5, f"{gross * commision_rate:.2f}"[:9], ln=0, border=1); pdf.cell(15, 5, f"{w_gets:.2f}"[:9], ln=1, border=1)
-        total_gross += gross; total_miles += miles; total_commission += (gross * commision_rate); total_loads += w_gets
-
-    pdf.set_font('helvetica', 'B', 8)
-    pdf.cell(15, 5, '', border=1); pdf.cell(15, 5, '', border=1); pdf.cell(30, 5, '', border=1); pdf.cell(30, 5, '', border=1); pdf.cell(30, 5, 'Totals:', align='R', border=1)
-    pdf.cell(15, 5, f"{total_gross:.2f}"[:9], border=1); pdf.cell(10, 5, f"{total_miles:.0f}"[:9], border=1); pdf.cell(17, 5, f"{total_commission:.2f}"[:9], border=1); pdf.cell(15, 5, f"{total_loads:.2f}"[:9], ln=1, border=1)
+    total_loads = _draw_loads_table(pdf, loads)
     pdf.ln(2)
 
     pdf.set_font('helvetica', 'B', 14); pdf.set_fill_color(232, 253, 226)
@@ -251,7 +321,7 @@ def compilate_salary_page(driver, cell, fuel_start_date, fuel_end_date, totals,
 
     def draw_deduction(label, value, total_base, color_override=None):
         pdf.set_font('helvetica', '', 12); pdf.cell(177, 8, f'{label}: ${abs(value):,.2f}', ln=1)
-        line_width = min((abs(value) / total_base) * 177 if total_base > 0 else 0, 177)
+        line_width = float(min((abs(value) / total_base) * 177 if total_base > 0 else 0, 177))
         if color_override == 'yellow': pdf.set_fill_color(252, 239, 37)
         else: pdf.set_fill_color(252, 66, 37) if value >= 0 else pdf.set_fill_color(85, 252, 37)
         pdf.cell(line_width, 0.5, '', ln=1, fill=True)
@@ -276,5 +346,4 @@ def compilate_salary_page(driver, cell, fuel_start_date, fuel_end_date, totals,
     pdf.ln(5); pdf.set_font('helvetica', 'B', 14); pdf.cell(177, 10, final_pay_str, ln=1)
     pdf.set_fill_color(74, 245, 44); pdf.cell(177, 15, f'Settlement Total: ${settlement:,.2f}', ln=1, align='C', fill=True)
     pdf.set_font('helvetica', '', 8); pdf.cell(177, 10, 'Please see a fuel Transaction Report below...', ln=1, align='C')
-    os.makedirs("./files_cash", exist_ok=True)
-    pdf.output('./files_cash/1st_page.pdf')
+    return bytes(pdf.output())
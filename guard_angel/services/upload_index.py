@@ -0,0 +1,51 @@
+from __future__ import annotations
+from pathlib import Path
+from contextlib import contextmanager
+import hashlib, sqlite3, threading, time
+
+# What we have already put on Drive, kept in .cache/uploads.sqlite:
+# one row per sheet slot ("<driver>!<column><row>") with the Drive file behind
+# its link and the md5 of the bytes we uploaded (Drive's md5Checksum is also
+# md5, so the two can be compared directly).
+_PATH = Path(__file__).resolve().parents[2] / ".cache" / "uploads.sqlite"
+_LOCK = threading.Lock()
+
+def file_md5(path: str) -> str:
+    h = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""): h.update(block)
+    return h.hexdigest()
+
+@contextmanager
+def _db():
+    with _LOCK:
+        _PATH.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(_PATH)
+        try:
+            with conn:
+                conn.execute("CREATE TABLE IF NOT EXISTS uploads (slot TEXT PRIMARY KEY, file_id TEXT NOT NULL, link TEXT NOT NULL, md5 TEXT NOT NULL, updated_at REAL NOT NULL)")
+                conn.execute("CREATE INDEX IF NOT EXISTS uploads_md5 ON uploads (md5)")
+                yield conn
+        finally: conn.close()
+
+def by_hash(md5: str) -> tuple[str, str] | None:
+    """(file_id, link) of a file we uploaded with exactly these bytes."""
+    with _db() as conn:
+        return conn.execute("SELECT file_id, link FROM uploads WHERE md5 = ? ORDER BY updated_at DESC LIMIT 1", (md5,)).fetchone()
+
+def by_slot(slot: str) -> tuple[str, str] | None:
+    """(file_id, link) of the file last uploaded for a sheet cell."""
+    with _db() as conn:
+        return conn.execute("SELECT file_id, link FROM uploads WHERE slot = ?", (slot,)).fetchone()
+
+def slots_using(file_id: str) -> int:
+    with _db() as conn:
+        return conn.execute("SELECT COUNT(*) FROM uploads WHERE file_id = ?", (file_id,)).fetchone()[0]
+
+def record(slot: str, file_id: str, link: str, md5: str):
+    with _db() as conn:
+        conn.execute("INSERT OR REPLACE INTO uploads VALUES (?, ?, ?, ?, ?)", (slot, file_id, link, md5, time.time()))
+
+def forget(file_id: str):
+    with _db() as conn:
+        conn.execute("DELETE FROM uploads WHERE file_id = ?", (file_id,))
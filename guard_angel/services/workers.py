@@ -0,0 +1,18 @@
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing, os, threading
+from ..config import settings
+
+# One process pool for CPU-bound work that would otherwise hold the GIL for
+# seconds (batch invoice rendering, POD image normalization). Workers are
+# spawned, not forked: the bot process has live threads (aio pool, Google
+# clients) that must not be copied mid-call. Created on first use.
+_pool: ProcessPoolExecutor | None = None
+_lock = threading.Lock()
+
+def processes() -> ProcessPoolExecutor:
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=settings.worker_processes or max(1, (os.cpu_count() or 2) - 1), mp_context=multiprocessing.get_context("spawn"))
+        return _pool
@@ -0,0 +1,62 @@
+from __future__ import annotations
+import argparse, sys, time
+from pathlib import Path
+
+# Ensure project root on sys.path
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in map(str, sys.path):
+    sys.path.insert(0, str(ROOT))
+
+from guard_angel.services import pdf_backend
+
+# PyMuPDF vs PyPDF2 on the documents the bot handles: merge (invoice page + RC + POD,
+# salary page + fuel statement) and text extraction (fuel statements).
+#   python scripts/bench_pdf_backend.py                      # synthetic documents
+#   python scripts/bench_pdf_backend.py fuel.pdf rc.pdf pod.pdf -n 20
+# For each backend prints the median time per operation and checks that both
+# backends extract the same words, so a parser change is not needed to switch.
+
+def _synthetic() -> dict[str, bytes]:
+    from fpdf import FPDF
+    fuel = FPDF(); fuel.set_font("helvetica", size=8)
+    states = ["TX", "OK", "MO", "IL", "IN", "OH", "PA", "NJ"]
+    for page in range(12):
+        fuel.add_page(); fuel.cell(0, 6, "Transaction Date 2025-01-07 2025-01-01", new_x="LMARGIN", new_y="NEXT")
+        for i in range(55):
+            fuel.cell(0, 4.5, f"{page * 55 + i:05d} 2025-01-0{1 + i % 7} LOVES #{300 + i} {states[i % 8]} ULSD 0.055 {80 + i % 40}.{i % 100:02d} 3.{i % 90:02d}9 {300 + i}.12", new_x="LMARGIN", new_y="NEXT")
+    fuel.cell(0, 6, "Totals 18,512.40", new_x="LMARGIN", new_y="NEXT"); fuel.cell(0, 6, "Total Discount 1,220.15", new_x="LMARGIN", new_y="NEXT")
+    page = FPDF(); page.add_page(); page.set_font("helvetica", size=12)
+    for i in range(30): page.cell(0, 8, f"Invoice line {i}: pick up / delivery / amount ${i * 100:,.2f}", new_x="LMARGIN", new_y="NEXT")
+    return {"fuel_statement (12 pages)": bytes(fuel.output()), "invoice_page (1 page)": bytes(page.output())}
+
+def _time(fn, repeat: int) -> float:
+    runs = []
+    for _ in range(repeat):
+        t = time.perf_counter(); fn(); runs.append(time.perf_counter() - t)
+    return sorted(runs)[len(runs) // 2] * 1000
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark PDF backends")
+    ap.add_argument("pdfs", nargs="*", help="PDF files to benchmark (default: synthetic fuel statement + invoice page)")
+    ap.add_argument("-n", "--repeat", type=int, default=10)
+    args = ap.parse_args()
+    docs = {Path(p).name: Path(p).read_bytes() for p in args.pdfs} or _synthetic()
+    backends = [pdf_backend.get("pymupdf"), pdf_backend.get("pypdf2")]
+    if backends[0].name != "pymupdf": sys.exit("PyMuPDF is not installed")
+
+    print(f"{'operation':<44}" + "".join(f"{b.name:>12}" for b in backends) + f"{'speedup':>10}")
+    rows = [(f"merge all ({len(docs)} docs)", lambda b: b.merge(list(docs.values())))]
+    rows += [(f"text: {name}", lambda b, d=data: b.page_texts(d)) for name, data in docs.items()]
+    rows += [(f"text, first page: {name}", lambda b, d=data: b.page_texts(d, 1)) for name, data in docs.items()]
+    for label, op in rows:
+        ms = [_time(lambda: op(b), args.repeat) for b in backends]
+        print(f"{label[:43]:<44}" + "".join(f"{m:>10.1f}ms" for m in ms) + f"{ms[1] / ms[0]:>9.1f}x")
+
+    print()
+    for name, data in docs.items():
+        words = [" ".join(b.page_texts(data)).split() for b in backends]
+        same = "same words" if words[0] == words[1] else f"DIFFERENT ({len(words[0])} vs {len(words[1])} words)"
+        print(f"{name}: {same}; merged size {len(backends[0].merge([data])) / 1024:.0f} KB vs {len(backends[1].merge([data])) / 1024:.0f} KB")
+
+if __name__ == "__main__":
+    main()
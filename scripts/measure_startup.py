@@ -0,0 +1,56 @@
+from __future__ import annotations
+import argparse, json, os, statistics, subprocess, sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Bot startup cost: wall time of `import guard_angel.bot` + build_app(), and the
+# resident memory of the bot process plus everything it spawned (geckodriver,
+# Firefox). Each run is a fresh interpreter; run from the project root (.env).
+#   python scripts/measure_startup.py -n 5
+#   git worktree add /tmp/before <commit>; python scripts/measure_startup.py --root /tmp/before
+# Linux only (reads /proc).
+CHILD = r"""
+import json, os, sys, time
+t = time.perf_counter()
+from guard_angel import bot
+bot.build_app()
+elapsed = time.perf_counter() - t
+
+def rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            return next((int(line.split()[1]) for line in f if line.startswith("VmRSS:")), 0)
+    except OSError: return 0
+
+children = {}
+for name in os.listdir("/proc"):
+    if not name.isdigit(): continue
+    try:
+        with open(f"/proc/{name}/stat") as f: ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+    except (OSError, IndexError, ValueError): continue
+    children.setdefault(ppid, []).append(int(name))
+tree, todo = [], [os.getpid()]
+while todo:
+    pid = todo.pop(); tree.append(pid); todo.extend(children.get(pid, []))
+print(json.dumps({"seconds": elapsed, "rss_mb": sum(map(rss_kb, tree)) / 1024, "processes": len(tree)}), flush=True)
+for pid in tree[1:]:  # browsers started at import are not quit by anything else
+    try: os.kill(pid, 15)
+    except OSError: pass
+"""
+
+def main():
+    ap = argparse.ArgumentParser(description="Measure bot startup time and resident memory")
+    ap.add_argument("-n", "--runs", type=int, default=3)
+    ap.add_argument("--root", default=str(ROOT), help="checkout to measure (default: this one)")
+    args = ap.parse_args()
+    runs = []
+    for i in range(args.runs):
+        out = subprocess.run([sys.executable, "-c", CHILD], cwd=os.getcwd(), env={**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [args.root, os.environ.get("PYTHONPATH")]))}, capture_output=True, text=True)
+        if out.returncode: sys.exit(out.stderr)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+        print(f"run {i + 1}: {runs[-1]['seconds']:.2f}s, {runs[-1]['rss_mb']:.0f} MB RSS in {runs[-1]['processes']} process(es)")
+    print(f"median: {statistics.median(r['seconds'] for r in runs):.2f}s, {statistics.median(r['rss_mb'] for r in runs):.0f} MB RSS")
+
+if __name__ == "__main__":
+    main()